@@ -1,30 +1,283 @@
 #Py.HagLib.Socket/Socket/BinaryFileProcessor.py
+import asyncio
+import concurrent.futures
+import errno
+import mmap
 import tempfile
 import os
+import sys
 import shutil
-from typing import List, Tuple, Dict, Optional
+import threading
+import types
+from typing import List, Mapping, Tuple, Dict, Optional, Union
 import uuid
 
+try:
+    import aiofiles
+except ImportError:
+    aiofiles = None
+
+# 書き込み可能なバイナリデータの型（バッファプロトコル対応オブジェクトはコピーせずに扱う）
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# 一時ファイル書き込み用のスレッドプール（書き込み中は GIL が解放されるため並列化できる）
+_WRITE_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=min(32, (os.cpu_count() or 4) * 2),
+    thread_name_prefix="BinaryFileProcessor"
+)
+
+# このファイル数以上のバッチはスレッドプールで並列に書き込む
+_PARALLEL_WRITE_MIN_FILES = 4
+
+# 1回の writev に渡せるバッファ数の上限
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 0
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
+# io_uring バックエンドのキュー深さ（1回の submit でまとめて発行する書き込み数）
+_URING_QUEUE_DEPTH = 128
+
+# このサイズ以上のデータは mmap 経由で書き込む（バイト）
+_MMAP_WRITE_THRESHOLD = 1 << 20
+
+# O_DIRECT 書き込みのアライメント（セクタ/ページサイズ）とバッファ設定
+_DIRECT_ALIGN = 4096
+_DIRECT_BLOCK_SIZE = 1 << 20
+_DIRECT_BUFFER_POOL_COUNT = 4
+
+# tmpfs を優先する際に必要な最小空き容量（バイト）
+_TMPFS_MIN_FREE = 64 * 1024 * 1024
+
+# Linux で常に tmpfs としてマウントされているディレクトリ
+_LINUX_SHM_DIR = "/dev/shm"
+
+# ファイルIDのバイト数（16進文字列では2倍の長さ）と、1回の os.urandom でまとめて取得するID数
+_FILE_ID_BYTES = 16
+_FILE_ID_POOL_COUNT = 1024
+
+
+def _as_byte_view(binary_data: BytesLike) -> memoryview:
+    """バイナリデータをコピーせずに1次元のバイト列ビューとして取得する"""
+    view = memoryview(binary_data)
+    if view.ndim != 1 or view.format != "B":
+        view = view.cast("B")
+    return view
+
+
+def _file_ext(filename: str) -> str:
+    """
+    ファイル名から拡張子を取得する（os.path.splitext と同じ規則）
+    
+    先頭がドットのファイル名（例: ".bashrc"）は拡張子なしとして扱う
+    """
+    dot = filename.rfind(".")
+    sep = filename.rfind(os.sep)
+    if os.altsep:
+        sep = max(sep, filename.rfind(os.altsep))
+    
+    # ドットより前にドット以外の文字がある場合のみ拡張子とみなす
+    if dot > sep and filename[sep + 1:dot].strip("."):
+        return filename[dot:]
+    return ""
+
+
+def _write_all_vectored(fd: int, views: List[memoryview]) -> None:
+    """
+    複数のバッファを os.writev でまとめてファイルに書き込む
+    部分的な書き込みの場合は残りを続けて書き込む。writev がない環境では順に os.write する
+    """
+    pending = [view for view in views if view.nbytes]
+    
+    if not hasattr(os, "writev"):
+        for view in pending:
+            while view.nbytes:
+                view = view[os.write(fd, view):]
+        return
+    
+    start = 0
+    while start < len(pending):
+        written = os.writev(fd, pending[start:start + _IOV_MAX])
+        
+        # 書き込み済みのバッファを読み飛ばし、途中まで書き込まれたバッファは残りを切り出す
+        while start < len(pending) and written >= pending[start].nbytes:
+            written -= pending[start].nbytes
+            start += 1
+        if written:
+            pending[start] = pending[start][written:]
+
+
+# カーネル内コピーが使えない場合に次の方法へフォールバックする errno
+_COPY_FALLBACK_ERRNOS = frozenset(
+    getattr(errno, name) for name in ("EXDEV", "EINVAL", "ENOSYS", "EOPNOTSUPP", "ENOTSUP", "ENOTSOCK")
+    if hasattr(errno, name)
+)
+
+# 長さ未指定時に1回のカーネル内コピーで要求するバイト数
+_COPY_CHUNK_SIZE = 1 << 30
+
+
+def _copy_fd(src_fd: int, dst_fd: int, length: Optional[int]) -> int:
+    """
+    ファイルディスクリプタ間でデータをコピーする
+    
+    copy_file_range、sendfile の順にカーネル内でのコピーを試し、どちらも使えない場合は
+    read/write でコピーする。どの方法でもソース側のファイル位置から読み進める
+    
+    Args:
+        src_fd: コピー元のファイルディスクリプタ
+        dst_fd: コピー先のファイルディスクリプタ
+        length: コピーするバイト数。Noneの場合は終端まで
+    
+    Returns:
+        コピーしたバイト数（ソースが途中で終端に達した場合は length より小さい）
+    """
+    remaining = _COPY_CHUNK_SIZE if length is None else length
+    copied = 0
+    
+    def done() -> bool:
+        return length is not None and copied >= length
+    
+    kernel_copies = []
+    if hasattr(os, "copy_file_range"):
+        kernel_copies.append(lambda count: os.copy_file_range(src_fd, dst_fd, count))
+    if hasattr(os, "sendfile"):
+        kernel_copies.append(lambda count: os.sendfile(dst_fd, src_fd, None, count))
+    
+    for copy in kernel_copies:
+        if done():
+            break
+        try:
+            while not done():
+                n = copy(remaining)
+                if n == 0:
+                    return copied
+                copied += n
+                if length is not None:
+                    remaining -= n
+        except OSError as e:
+            if e.errno not in _COPY_FALLBACK_ERRNOS:
+                raise
+    
+    while not done():
+        chunk = os.read(src_fd, min(remaining, 1 << 20))
+        if not chunk:
+            break
+        view = memoryview(chunk)
+        while view.nbytes:
+            view = view[os.write(dst_fd, view):]
+        copied += len(chunk)
+        if length is not None:
+            remaining -= len(chunk)
+    
+    return copied
+
+
+def _default_temp_dir(use_tmpfs: bool) -> str:
+    """
+    既定の一時ディレクトリを決定する
+    
+    環境変数 HAGLIB_TMPFS_DIR が設定されていればそれを使用する（Solaris/illumos などで
+    `mount -F tmpfs` したディレクトリを指定する用途）。Linux では /dev/shm に十分な空きが
+    あれば /dev/shm を使用し、それ以外はシステムの一時ディレクトリを使用する。
+    tmpfs 上のファイルはメモリ上にあり、再起動後には残らない。
+    
+    Args:
+        use_tmpfs: tmpfs を優先するかどうか
+    
+    Returns:
+        一時ディレクトリのパス
+    """
+    if use_tmpfs:
+        tmpfs_dir = os.environ.get("HAGLIB_TMPFS_DIR")
+        if tmpfs_dir:
+            return tmpfs_dir
+        
+        if sys.platform.startswith("linux") and os.path.isdir(_LINUX_SHM_DIR):
+            try:
+                st = os.statvfs(_LINUX_SHM_DIR)
+                if st.f_bavail * st.f_frsize >= _TMPFS_MIN_FREE:
+                    return _LINUX_SHM_DIR
+            except OSError:
+                pass
+    
+    return tempfile.gettempdir()
+
+
+def _load_uring():
+    """
+    io_uring バックエンド (pyuring) を遅延インポートする
+    
+    Returns:
+        pyuring モジュール。Linux 以外、またはインポートできない場合はNone
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import pyuring
+    except Exception:
+        return None
+    return pyuring
+
+
 class BinaryFileProcessor:
     """
     バイナリデータとファイル名を処理するクラス
     一時ファイルの管理と操作を行う
     """
     
-    def __init__(self, temp_dir: Optional[str] = None):
+    def __init__(self, temp_dir: Optional[str] = None, io_backend: str = "sync", use_tmpfs: bool = True,
+                 direct: bool = False, strict_uuid: bool = False):
         """
         初期化メソッド
         
         Args:
-            temp_dir: 一時ファイルを保存するディレクトリ。Noneの場合はシステムのデフォルト一時ディレクトリを使用
+            temp_dir: 一時ファイルを保存するディレクトリ。Noneの場合は既定の一時ディレクトリを使用
+            io_backend: 書き込みバックエンド。"sync"（既定）または "uring"（Linux + pyuring が必要。
+                        利用できない場合は "sync" にフォールバック）
+            use_tmpfs: temp_dir が None の場合に tmpfs（Linux では /dev/shm）を優先するかどうか。
+                       tmpfs 上のファイルは再起動後には残らない
+            direct: True の場合、O_DIRECT でページキャッシュを経由せずに書き込む（Linux のみ。
+                    ファイルシステムが対応していない場合は通常の書き込みにフォールバック）
+            strict_uuid: True の場合、ファイルIDを UUID 文字列（ハイフン付き）で生成する。
+                         既定ではまとめて取得した乱数から32文字の16進文字列を生成する
         """
-        self.temp_dir = temp_dir or tempfile.gettempdir()
-        self.file_mappings: Dict[str, Tuple[str, str]] = {}  # ID -> (temp_path, original_filename)
+        self.temp_dir = temp_dir or _default_temp_dir(use_tmpfs)
+        # 一時ファイルはすべてインスタンス専用のサブディレクトリに作成し、cleanup で一括削除する
+        self._instance_dir = os.path.join(self.temp_dir, f"haglib-{os.getpid()}-{uuid.uuid4().hex}")
+        self._temp_dir_prefix = os.path.join(self._instance_dir, "")  # 区切り文字付きのディレクトリパス
+        # ファイル情報は一時ファイルパスとオリジナルファイル名の並列リストで保持する
+        # 削除されたファイルの位置は None（墓標）にしておき、一定数たまったら詰める
+        self._paths: List[Optional[str]] = []
+        self._names: List[Optional[str]] = []
+        self._id_to_idx: Dict[str, int] = {}  # ID -> リスト上の位置
+        self._removed_count = 0
+        self.segment_mappings: Dict[str, Tuple[str, str, int, int]] = {}  # ID -> (blob_path, original_filename, offset, length)
+        self._blob_refs: Dict[str, int] = {}  # 連結ファイル -> まだ削除されていないデータ数
+        
+        # ファイルID生成用の乱数プール（16進文字列として保持し、先頭から切り出して使う）
+        self._strict_uuid = strict_uuid
+        # 複数スレッドから同じ乱数を切り出さないようロックで保護し、fork した子プロセスでは親と同じIDを
+        # 生成しないよう、作成したプロセスIDと異なる場合はプールを破棄する
+        self._id_pool = ""
+        self._id_pool_pos = 0
+        self._id_lock = threading.Lock()
+        self._id_pid = os.getpid()
+        
+        # io_uring バックエンドの準備（利用できなければ同期書き込み）
+        self._uring = _load_uring() if io_backend == "uring" else None
+        self.io_backend = "uring" if self._uring is not None else "sync"
+        
+        # O_DIRECT 書き込みの準備（ページ境界に揃った書き込みバッファを使い回す）
+        self._direct = direct and hasattr(os, "O_DIRECT")
+        self._direct_buffers: List[mmap.mmap] = []
         
         # 一時ディレクトリが存在しない場合は作成
-        os.makedirs(self.temp_dir, exist_ok=True)
+        os.makedirs(self._instance_dir, exist_ok=True)
     
-    def process_files(self, binary_data_list: List[bytes], original_filenames: List[str]) -> List[str]:
+    def process_files(self, binary_data_list: List[BytesLike], original_filenames: List[str]) -> List[str]:
         """
         バイナリデータとオリジナルファイル名のリストを処理し、
         一時ファイルを作成してファイルIDのリストを返す
@@ -39,44 +292,540 @@ class BinaryFileProcessor:
         if len(binary_data_list) != len(original_filenames):
             raise ValueError("バイナリデータとファイル名の数が一致しません")
         
-        file_ids = []
+        if self._uring is not None:
+            # io_uring: まとめて書き込みを発行する
+            return self._create_temp_files_uring(binary_data_list, original_filenames)
+        
+        targets = self._new_temp_paths(original_filenames)
+        
+        if len(targets) >= _PARALLEL_WRITE_MIN_FILES:
+            # スレッドプールで並列に書き込む
+            return self._create_temp_files_parallel(targets, binary_data_list, original_filenames)
         
-        for binary_data, original_filename in zip(binary_data_list, original_filenames):
-            file_id = self._create_temp_file(binary_data, original_filename)
-            file_ids.append(file_id)
+        file_ids: List[str] = [None] * len(targets)
+        paths, names, id_to_idx = self._paths, self._names, self._id_to_idx
+        
+        for i, ((file_id, temp_path), binary_data, original_filename) in enumerate(
+                zip(targets, binary_data_list, original_filenames)):
+            self._sync_write(temp_path, binary_data)
+            id_to_idx[file_id] = len(paths)
+            paths.append(temp_path)
+            names.append(original_filename)
+            file_ids[i] = file_id
         
         return file_ids
     
-    def _create_temp_file(self, binary_data: bytes, original_filename: str) -> str:
+    def _create_temp_files_parallel(self, targets: List[Tuple[str, str]], binary_data_list: List[BytesLike],
+                                    original_filenames: List[str]) -> List[str]:
         """
-        バイナリデータを一時ファイルに書き込み、ファイルIDを返す
+        スレッドプールで複数の一時ファイルを並列に書き込む
+        
+        マッピング情報は呼び出し元のスレッドで登録する。書き込みに失敗したファイルがある場合でも
+        成功したファイルは登録し（cleanup で削除できるように）、最初の例外を送出する
         
         Args:
-            binary_data: バイナリデータ
+            targets: (ファイルID, 一時ファイルパス)のタプルのリスト
+            binary_data_list: バイナリデータのリスト
+            original_filenames: オリジナルファイル名のリスト
+        
+        Returns:
+            ファイルIDのリスト
+        """
+        futures = [
+            _WRITE_POOL.submit(self._sync_write, temp_path, binary_data)
+            for (_, temp_path), binary_data in zip(targets, binary_data_list)
+        ]
+        
+        file_ids: List[str] = [None] * len(targets)
+        paths, names, id_to_idx = self._paths, self._names, self._id_to_idx
+        error: Optional[BaseException] = None
+        
+        for i, (future, (file_id, temp_path), original_filename) in enumerate(
+                zip(futures, targets, original_filenames)):
+            try:
+                future.result()
+            except Exception as e:
+                if error is None:
+                    error = e
+                continue
+            id_to_idx[file_id] = len(paths)
+            paths.append(temp_path)
+            names.append(original_filename)
+            file_ids[i] = file_id
+        
+        if error is not None:
+            raise error
+        
+        return file_ids
+    
+    def process_files_concat(self, binary_data_list: List[BytesLike], original_filenames: List[str]) -> List[str]:
+        """
+        複数のバイナリデータを1つの一時ファイルに連結して書き込み、データごとのファイルIDのリストを返す
+        
+        ファイルを1つだけ開き、os.writev でまとめて書き込む。各データの位置は segment_mappings に
+        (連結ファイルパス, オリジナルファイル名, オフセット, 長さ) として記録され、
+        get_segment_info / read_segment で参照できる
+        
+        Args:
+            binary_data_list: バイナリデータのリスト
+            original_filenames: オリジナルファイル名のリスト
+        
+        Returns:
+            ファイルIDのリスト
+        """
+        if len(binary_data_list) != len(original_filenames):
+            raise ValueError("バイナリデータとファイル名の数が一致しません")
+        
+        views = [_as_byte_view(binary_data) for binary_data in binary_data_list]
+        _, blob_path = self._new_temp_path("segments.blob")
+        
+        fd = os.open(blob_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            _write_all_vectored(fd, views)
+        finally:
+            os.close(fd)
+        
+        # 各データの位置を登録
+        file_ids: List[str] = [None] * len(views)
+        segment_mappings = self.segment_mappings
+        offset = 0
+        
+        for i, (file_id, view, original_filename) in enumerate(
+                zip(self._new_file_ids(len(views)), views, original_filenames)):
+            segment_mappings[file_id] = (blob_path, original_filename, offset, view.nbytes)
+            file_ids[i] = file_id
+            offset += view.nbytes
+        self._blob_refs[blob_path] = len(file_ids)
+        
+        return file_ids
+    
+    def process_fd(self, src_fd: int, length: Optional[int], original_filename: str) -> str:
+        """
+        ファイルディスクリプタから読み出したデータを一時ファイルに書き込み、ファイルIDを返す
+        
+        データは Python 側にコピーせず、可能であればカーネル内（copy_file_range / sendfile）で転送する
+        
+        Args:
+            src_fd: コピー元のファイルディスクリプタ（現在のファイル位置から読み出す）
+            length: 書き込むバイト数。Noneの場合は終端まで
             original_filename: オリジナルファイル名
         
         Returns:
             ファイルID
         """
+        file_id, temp_path = self._new_temp_path(original_filename)
+        
+        dst_fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            # 登録を先に行い、コピーに失敗しても cleanup で削除されるようにする
+            self._add_file(file_id, temp_path, original_filename)
+            _copy_fd(src_fd, dst_fd, length)
+        finally:
+            os.close(dst_fd)
+        
+        return file_id
+    
+    def get_segment_info(self, file_id: str) -> Tuple[str, str, int, int]:
+        """
+        process_files_concat で登録したファイルIDから連結ファイル内の位置を取得
+        
+        Args:
+            file_id: ファイルID
+        
+        Returns:
+            (連結ファイルパス, オリジナルファイル名, オフセット, 長さ)のタプル
+        """
+        if file_id not in self.segment_mappings:
+            raise KeyError(f"ファイルID '{file_id}' は存在しません")
+        
+        return self.segment_mappings[file_id]
+    
+    def read_segment(self, file_id: str) -> bytes:
+        """
+        process_files_concat で登録したファイルIDのデータを読み込む
+        
+        Args:
+            file_id: ファイルID
+        
+        Returns:
+            バイナリデータ
+        """
+        blob_path, _, offset, length = self.get_segment_info(file_id)
+        
+        fd = os.open(blob_path, os.O_RDONLY)
+        try:
+            return os.pread(fd, length, offset)
+        finally:
+            os.close(fd)
+    
+    def remove_segment(self, file_id: str) -> bool:
+        """
+        process_files_concat で登録したファイルIDの登録を解除する
+        
+        連結ファイル内のすべてのデータの登録が解除された時点で、連結ファイルを削除する
+        
+        Args:
+            file_id: ファイルID
+        
+        Returns:
+            削除が成功したかどうか
+        """
+        segment = self.segment_mappings.pop(file_id, None)
+        if segment is None:
+            return False
+        
+        blob_path = segment[0]
+        remaining = self._blob_refs.get(blob_path, 1) - 1
+        if remaining > 0:
+            self._blob_refs[blob_path] = remaining
+            return True
+        
+        self._blob_refs.pop(blob_path, None)
+        try:
+            os.remove(blob_path)
+        except OSError:
+            return False
+        return True
+    
+    async def process_files_async(self, binary_data_list: List[BytesLike], original_filenames: List[str]) -> List[str]:
+        """
+        process_files の非同期版。各ファイルの書き込みを並行して実行する
+        
+        Args:
+            binary_data_list: バイナリデータのリスト
+            original_filenames: オリジナルファイル名のリスト
+        
+        Returns:
+            ファイルIDのリスト
+        """
+        if len(binary_data_list) != len(original_filenames):
+            raise ValueError("バイナリデータとファイル名の数が一致しません")
+        
+        # ファイルIDとパスは呼び出し元のスレッドで生成
+        targets = self._new_temp_paths(original_filenames)
+        
+        await asyncio.gather(*(
+            self._awrite(temp_path, binary_data)
+            for (_, temp_path), binary_data in zip(targets, binary_data_list)
+        ))
+        
+        # マッピング情報は書き込み完了後にまとめて登録（辞書の競合を避ける）
+        return self._register_temp_files(targets, original_filenames)
+    
+    async def _awrite(self, temp_path: str, binary_data: BytesLike) -> None:
+        """
+        バイナリデータを非同期でファイルに書き込む
+        aiofiles があればそれを使い、なければスレッドで同期書き込みを行う
+        """
+        if aiofiles is not None:
+            async with aiofiles.open(temp_path, "wb") as f:
+                await f.write(binary_data)
+        else:
+            await asyncio.to_thread(self._sync_write, temp_path, binary_data)
+    
+    def _sync_write(self, temp_path: str, binary_data: BytesLike) -> None:
+        """
+        バイナリデータをファイルに書き込む
+        大きなデータはバッファ付き書き込みを経由せず、mmap したファイルへ直接コピーする
+        """
+        data = _as_byte_view(binary_data)
+        size = data.nbytes
+        if self._direct and size >= _DIRECT_ALIGN:
+            if self._direct_write(temp_path, data):
+                return
+        
+        if size >= _MMAP_WRITE_THRESHOLD:
+            fd = os.open(temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o666)
+            try:
+                os.ftruncate(fd, size)
+                with mmap.mmap(fd, size) as mm:
+                    mm[:size] = data
+            finally:
+                os.close(fd)
+            return
+        
+        with open(temp_path, "wb") as f:
+            f.write(data)
+    
+    def _direct_write(self, temp_path: str, binary_data: BytesLike) -> bool:
+        """
+        O_DIRECT でバイナリデータを書き込む
+        
+        データをページ境界に揃ったバッファへブロック単位でコピーしてアライメントされた長さで書き込み、
+        最後にファイルを実際のサイズに切り詰める
+        
+        Returns:
+            書き込んだ場合はTrue、ファイルシステムが O_DIRECT に対応していない場合はFalse
+        """
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT, 0o666)
+        except OSError as e:
+            if e.errno == errno.EINVAL:
+                self._direct = False
+                return False
+            raise
+        
+        data = _as_byte_view(binary_data)
+        size = data.nbytes
+        buf = self._acquire_direct_buffer()
+        try:
+            with memoryview(buf) as buf_view:
+                offset = 0
+                while offset < size:
+                    n = min(_DIRECT_BLOCK_SIZE, size - offset)
+                    buf_view[:n] = data[offset:offset + n]
+                    
+                    # 書き込み長はアライメント単位に切り上げる（余分な部分は最後に切り詰める）
+                    aligned = (n + _DIRECT_ALIGN - 1) & ~(_DIRECT_ALIGN - 1)
+                    written = 0
+                    while written < aligned:
+                        written += os.write(fd, buf_view[written:aligned])
+                    offset += n
+            
+            os.ftruncate(fd, size)
+        finally:
+            self._release_direct_buffer(buf)
+            os.close(fd)
+        
+        return True
+    
+    def _acquire_direct_buffer(self) -> mmap.mmap:
+        """O_DIRECT 用のページ境界に揃ったバッファを取得する"""
+        try:
+            return self._direct_buffers.pop()
+        except IndexError:
+            return mmap.mmap(-1, _DIRECT_BLOCK_SIZE)
+    
+    def _release_direct_buffer(self, buf: mmap.mmap) -> None:
+        """O_DIRECT 用のバッファをプールに戻す"""
+        if len(self._direct_buffers) < _DIRECT_BUFFER_POOL_COUNT:
+            self._direct_buffers.append(buf)
+        else:
+            buf.close()
+    
+    def _new_file_ids(self, count: int) -> List[str]:
+        """
+        新しいファイルIDをまとめて生成する
+        乱数は _FILE_ID_POOL_COUNT 個分をまとめて取得し、使い切ったら補充する
+        
+        Args:
+            count: 生成するID数
+        
+        Returns:
+            ファイルIDのリスト
+        """
+        if self._strict_uuid:
+            return [str(uuid.uuid4()) for _ in range(count)]
+        
+        width = _FILE_ID_BYTES * 2
+        file_ids: List[str] = [None] * count
+        
+        pid = os.getpid()
+        if pid != self._id_pid:
+            # fork した子プロセス: 親から引き継いだプールとロックは使わない
+            self._id_lock = threading.Lock()
+            self._id_pool, self._id_pool_pos = "", 0
+            self._id_pid = pid
+        
+        with self._id_lock:
+            pool, pos = self._id_pool, self._id_pool_pos
+            for i in range(count):
+                if pos >= len(pool):
+                    pool = os.urandom(_FILE_ID_BYTES * max(_FILE_ID_POOL_COUNT, count - i)).hex()
+                    pos = 0
+                file_ids[i] = pool[pos:pos + width]
+                pos += width
+            self._id_pool, self._id_pool_pos = pool, pos
+        return file_ids
+    
+    def _new_temp_path(self, original_filename: str) -> Tuple[str, str]:
+        """
+        新しいファイルIDと一時ファイルパスを生成する
+        
+        Args:
+            original_filename: オリジナルファイル名
+        
+        Returns:
+            (ファイルID, 一時ファイルパス)のタプル
+        """
         # ファイルIDを生成
-        file_id = str(uuid.uuid4())
+        file_id = self._new_file_ids(1)[0]
         
-        # 元のファイル名から拡張子を取得
-        _, ext = os.path.splitext(original_filename)
+        # 元のファイル名の拡張子を付けた一時ファイルパスを生成
+        return file_id, f"{self._temp_dir_prefix}{file_id}{_file_ext(original_filename)}"
+    
+    def _new_temp_paths(self, original_filenames: List[str]) -> List[Tuple[str, str]]:
+        """
+        複数のファイルIDと一時ファイルパスをまとめて生成する
         
-        # 一時ファイルパスを生成
-        temp_filename = f"{file_id}{ext}"
-        temp_path = os.path.join(self.temp_dir, temp_filename)
+        Args:
+            original_filenames: オリジナルファイル名のリスト
+        
+        Returns:
+            (ファイルID, 一時ファイルパス)のタプルのリスト
+        """
+        prefix = self._temp_dir_prefix
+        return [
+            (file_id, f"{prefix}{file_id}{_file_ext(original_filename)}")
+            for file_id, original_filename in zip(self._new_file_ids(len(original_filenames)), original_filenames)
+        ]
+    
+    def _create_temp_file(self, binary_data: BytesLike, original_filename: str) -> str:
+        """
+        バイナリデータを一時ファイルに書き込み、ファイルIDを返す
+        
+        Args:
+            binary_data: バイナリデータ
+            original_filename: オリジナルファイル名
+        
+        Returns:
+            ファイルID
+        """
+        if self._uring is not None:
+            # io_uring: 深さ1のバッチとして書き込む
+            return self._create_temp_files_uring([binary_data], [original_filename])[0]
+        
+        file_id, temp_path = self._new_temp_path(original_filename)
         
         # バイナリデータをファイルに書き込む
-        with open(temp_path, "wb") as f:
-            f.write(binary_data)
+        self._sync_write(temp_path, binary_data)
         
         # マッピング情報を保存
-        self.file_mappings[file_id] = (temp_path, original_filename)
+        self._add_file(file_id, temp_path, original_filename)
         
         return file_id
     
+    def _create_temp_files_uring(self, binary_data_list: List[BytesLike], original_filenames: List[str]) -> List[str]:
+        """
+        io_uring を使って複数の一時ファイルをまとめて書き込む
+        
+        書き込みは最大 _URING_QUEUE_DEPTH 件ずつ1回の submit で発行し、
+        完了をすべて回収した後にマッピング情報を登録する
+        
+        Args:
+            binary_data_list: バイナリデータのリスト
+            original_filenames: オリジナルファイル名のリスト
+        
+        Returns:
+            ファイルIDのリスト
+        """
+        # ファイルIDとパスを先にすべて生成
+        targets = self._new_temp_paths(original_filenames)
+        count = len(targets)
+        written: List[int] = []  # 書き込みが完了したファイルの位置
+        
+        try:
+            with self._uring.UringCtx(entries=_URING_QUEUE_DEPTH) as ctx:
+                for start in range(0, count, _URING_QUEUE_DEPTH):
+                    end = min(start + _URING_QUEUE_DEPTH, count)
+                    fds: Dict[int, int] = {}  # index -> fd
+                    # 発行したバッファはカーネルが読み出すため、完了をすべて回収するまで参照を保持する
+                    buffers: List[Union[bytes, bytearray]] = []
+                    pending = 0
+                    try:
+                        for i in range(start, end):
+                            fds[i] = os.open(targets[i][1], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+                            data = binary_data_list[i]
+                            if not data:
+                                written.append(i)
+                                continue
+                            # pyuring は bytes / bytearray のみ受け付ける
+                            if not isinstance(data, (bytes, bytearray)):
+                                data = _as_byte_view(data).tobytes()
+                            buffers.append(data)
+                            ctx.write_async(fds[i], data, 0, user_data=i)
+                        
+                        if buffers:
+                            ctx.submit()
+                            pending = len(buffers)
+                        
+                        # 完了を回収
+                        while pending:
+                            index, result = ctx.wait_completion()
+                            pending -= 1
+                            if result < 0:
+                                raise OSError(-result, os.strerror(-result), targets[index][1])
+                            
+                            # 短い書き込みは残りを同期で書き込む
+                            data = _as_byte_view(binary_data_list[index])
+                            while result < data.nbytes:
+                                result += os.pwrite(fds[index], data[result:], result)
+                            written.append(index)
+                    finally:
+                        # 例外で中断した場合も、発行済みの書き込みの完了を回収してからバッファを解放する
+                        while pending:
+                            pending -= 1
+                            try:
+                                index, result = ctx.wait_completion()
+                            except Exception:
+                                continue
+                            if result == _as_byte_view(binary_data_list[index]).nbytes:
+                                written.append(index)
+                        for fd in fds.values():
+                            os.close(fd)
+        except BaseException:
+            # 書き込みが完了したファイルは登録し（cleanup で削除できるように）、最初の例外を送出する
+            written.sort()
+            self._register_temp_files([targets[i] for i in written], [original_filenames[i] for i in written])
+            raise
+        
+        # マッピング情報を保存
+        return self._register_temp_files(targets, original_filenames)
+    
+    def _register_temp_files(self, targets: List[Tuple[str, str]], original_filenames: List[str]) -> List[str]:
+        """
+        書き込み済みの一時ファイルのマッピング情報をまとめて登録する
+        
+        Args:
+            targets: (ファイルID, 一時ファイルパス)のタプルのリスト
+            original_filenames: オリジナルファイル名のリスト
+        
+        Returns:
+            ファイルIDのリスト
+        """
+        file_ids: List[str] = [None] * len(targets)
+        paths, names, id_to_idx = self._paths, self._names, self._id_to_idx
+        
+        for i, ((file_id, temp_path), original_filename) in enumerate(zip(targets, original_filenames)):
+            id_to_idx[file_id] = len(paths)
+            paths.append(temp_path)
+            names.append(original_filename)
+            file_ids[i] = file_id
+        
+        return file_ids
+    
+    def _add_file(self, file_id: str, temp_path: str, original_filename: str) -> None:
+        """一時ファイルのマッピング情報を登録する"""
+        self._id_to_idx[file_id] = len(self._paths)
+        self._paths.append(temp_path)
+        self._names.append(original_filename)
+    
+    def _compact(self) -> None:
+        """削除済みの位置（墓標）を取り除いてリストを詰める"""
+        paths: List[Optional[str]] = []
+        names: List[Optional[str]] = []
+        id_to_idx: Dict[str, int] = {}
+        
+        for file_id, idx in self._id_to_idx.items():
+            id_to_idx[file_id] = len(paths)
+            paths.append(self._paths[idx])
+            names.append(self._names[idx])
+        
+        self._paths, self._names, self._id_to_idx = paths, names, id_to_idx
+        self._removed_count = 0
+    
+    @property
+    def file_mappings(self) -> Mapping[str, Tuple[str, str]]:
+        """
+        ID -> (一時ファイルパス, オリジナルファイル名) の読み取り専用マッピング（取得時点のスナップショット）
+        
+        以前は変更可能な辞書だったが、現在は変更すると TypeError となる。
+        ファイルの削除には remove_file を使用すること
+        """
+        paths, names = self._paths, self._names
+        return types.MappingProxyType(
+            {file_id: (paths[idx], names[idx]) for file_id, idx in self._id_to_idx.items()})
+    
     def get_file_info(self, file_id: str) -> Tuple[str, str]:
         """
         ファイルIDから一時ファイルパスとオリジナルファイル名を取得
@@ -87,10 +836,11 @@ class BinaryFileProcessor:
         Returns:
             (一時ファイルパス, オリジナルファイル名)のタプル
         """
-        if file_id not in self.file_mappings:
+        idx = self._id_to_idx.get(file_id)
+        if idx is None:
             raise KeyError(f"ファイルID '{file_id}' は存在しません")
         
-        return self.file_mappings[file_id]
+        return self._paths[idx], self._names[idx]
     
     def get_all_file_info(self) -> List[Tuple[str, str]]:
         """
@@ -99,33 +849,38 @@ class BinaryFileProcessor:
         Returns:
             (一時ファイルパス, オリジナルファイル名)のタプルのリスト
         """
-        return list(self.file_mappings.values())
+        if self._removed_count:
+            return [(path, name) for path, name in zip(self._paths, self._names) if path is not None]
+        return list(zip(self._paths, self._names))
 
 
-    def process_data_sets(self, data_sets: List[Tuple[str, bytes]]) -> List[Tuple[str, str]]:
+    def process_data_sets(self, data_sets: List[Tuple[str, Union[BytesLike, int]]]) -> List[Tuple[str, str]]:
         """
         (ファイル名, バイナリデータ)のタプルリストを処理し、
         (一時ファイルパス, 元のファイル名)のタプルリストを返す
         
         Args:
-            data_sets: (ファイル名, バイナリデータ)のタプルリスト
+            data_sets: (ファイル名, バイナリデータ)のタプルリスト。
+                       バイナリデータの代わりにファイルディスクリプタ（int）を渡した場合は、
+                       終端までのデータを process_fd で書き込む
         
         Returns:
             (一時ファイルパス, 元のファイル名)のタプルリスト
         """
-        result = []
-        file_ids = []
+        result: List[Tuple[str, str]] = [None] * len(data_sets)
         
-        for original_filename, binary_data in data_sets:
+        for i, (original_filename, binary_data) in enumerate(data_sets):
             # 一時ファイルの作成
-            file_id = self._create_temp_file(binary_data, original_filename)
-            file_ids.append(file_id)
+            if isinstance(binary_data, int):
+                file_id = self.process_fd(binary_data, None, original_filename)
+            else:
+                file_id = self._create_temp_file(binary_data, original_filename)
             
             # ファイル情報を取得
-            temp_path, _ = self.file_mappings[file_id]
+            temp_path = self._paths[self._id_to_idx[file_id]]
             
             # 結果リストに追加
-            result.append((temp_path, original_filename))
+            result[i] = (temp_path, original_filename)
         
         return result
     
@@ -133,36 +888,199 @@ class BinaryFileProcessor:
         """
         指定されたファイルIDの一時ファイルを削除
         
+        個別に削除する場合に使用する。すべてのファイルを削除する場合は cleanup を使用すること
+        （インスタンス専用ディレクトリごと一括で削除するため高速）。
+        
         Args:
-            file_id: ファイルID
+            file_id: ファイルID（process_files_concat のファイルIDの場合は remove_segment と同じ）
         
         Returns:
             削除が成功したかどうか
         """
-        if file_id not in self.file_mappings:
-            return False
-        
-        temp_path, _ = self.file_mappings[file_id]
+        idx = self._id_to_idx.get(file_id)
+        if idx is None:
+            # process_files_concat で登録したファイルIDの場合
+            return self.remove_segment(file_id)
         
         try:
-            os.remove(temp_path)
-            del self.file_mappings[file_id]
-            return True
+            os.remove(self._paths[idx])
         except OSError:
             return False
+        
+        self._forget_file(file_id, idx)
+        return True
+    
+    def _forget_file(self, file_id: str, idx: int) -> None:
+        """削除したファイルのマッピング情報を取り除く"""
+        # 位置は墓標にしておき、半分以上が削除済みになったら詰める
+        del self._id_to_idx[file_id]
+        self._paths[idx] = None
+        self._names[idx] = None
+        self._removed_count += 1
+        if self._removed_count * 2 > len(self._paths):
+            self._compact()
     
     def cleanup(self) -> None:
         """
         すべての一時ファイルを削除
+        
+        インスタンス専用ディレクトリを丸ごと削除した後、空のディレクトリを作り直す。
+        """
+        self._remove_all()
+        os.makedirs(self._instance_dir, exist_ok=True)
+    
+    def _remove_all(self) -> None:
+        """
+        インスタンス専用ディレクトリを削除し、ファイル情報をすべて破棄する
         """
-        for file_id in list(self.file_mappings.keys()):
-            self.remove_file(file_id)
+        shutil.rmtree(self._instance_dir, ignore_errors=True)
+        self._paths.clear()
+        self._names.clear()
+        self._id_to_idx.clear()
+        self._removed_count = 0
+        self.segment_mappings.clear()
+        self._blob_refs.clear()
     
     def __del__(self):
         """
         デストラクタ: インスタンスが破棄される際に一時ファイルをクリーンアップ
         """
-        self.cleanup()
+        # __init__ が途中で失敗した場合はディレクトリが存在しない
+        if getattr(self, "_id_to_idx", None) is not None:
+            self._remove_all()
+
+
+class InMemoryFileProcessor(BinaryFileProcessor):
+    """
+    一時ファイルをディスクに書かず、メモリ上の匿名ファイル（memfd）に保持するプロセッサー
+    
+    各データは memfd_create で作成した匿名ファイルに書き込まれ、一時ファイルパスとして
+    /proc/self/fd/N が登録される。パスは同じプロセス内でのみ有効で、ファイル名に拡張子は
+    含まれないため、種類の判定にはマッピングに保存されたオリジナルファイル名を使用すること。
+    memfd_create が利用できない環境では BinaryFileProcessor と同じく一時ファイルに書き込む。
+    process_files_concat / process_fd は通常どおり一時ディレクトリに書き込む。
+    """
+    
+    def __init__(self, temp_dir: Optional[str] = None, use_tmpfs: bool = True):
+        """
+        初期化メソッド
+        
+        Args:
+            temp_dir: memfd が利用できない場合や連結ファイルを保存するディレクトリ。
+                      Noneの場合は既定の一時ディレクトリを使用
+            use_tmpfs: temp_dir が None の場合に tmpfs（Linux では /dev/shm）を優先するかどうか
+        """
+        self._fds: Dict[str, int] = {}  # ID -> memfd
+        super().__init__(temp_dir, use_tmpfs=use_tmpfs)
+        self._memfd = hasattr(os, "memfd_create")
+    
+    def process_files(self, binary_data_list: List[BytesLike], original_filenames: List[str]) -> List[str]:
+        """
+        バイナリデータとオリジナルファイル名のリストを処理し、
+        メモリ上の匿名ファイルを作成してファイルIDのリストを返す
+        
+        Args:
+            binary_data_list: バイナリデータのリスト
+            original_filenames: オリジナルファイル名のリスト
+        
+        Returns:
+            ファイルIDのリスト
+        """
+        if not self._memfd:
+            return super().process_files(binary_data_list, original_filenames)
+        
+        if len(binary_data_list) != len(original_filenames):
+            raise ValueError("バイナリデータとファイル名の数が一致しません")
+        
+        return [
+            self._create_temp_file(binary_data, original_filename)
+            for binary_data, original_filename in zip(binary_data_list, original_filenames)
+        ]
+    
+    async def process_files_async(self, binary_data_list: List[BytesLike], original_filenames: List[str]) -> List[str]:
+        """
+        process_files の非同期版。memfd への書き込みはメモリコピーのみのため、そのまま同期で実行する
+        
+        Args:
+            binary_data_list: バイナリデータのリスト
+            original_filenames: オリジナルファイル名のリスト
+        
+        Returns:
+            ファイルIDのリスト
+        """
+        if not self._memfd:
+            return await super().process_files_async(binary_data_list, original_filenames)
+        
+        return self.process_files(binary_data_list, original_filenames)
+    
+    def _create_temp_file(self, binary_data: BytesLike, original_filename: str) -> str:
+        """
+        バイナリデータを memfd に書き込み、ファイルIDを返す
+        
+        Args:
+            binary_data: バイナリデータ
+            original_filename: オリジナルファイル名
+        
+        Returns:
+            ファイルID
+        """
+        if not self._memfd:
+            return super()._create_temp_file(binary_data, original_filename)
+        
+        data = _as_byte_view(binary_data)
+        size = data.nbytes
+        file_id = self._new_file_ids(1)[0]
+        
+        # memfd の名前は /proc/self/fd/N のリンク先に表示されるだけのため、長さ制限（249バイト）のある
+        # オリジナルファイル名は使わず、固定の接頭辞とファイルIDにする（オリジナルファイル名はマッピングに保持する）
+        fd = os.memfd_create(f"haglib-{file_id}", os.MFD_CLOEXEC)
+        try:
+            if size >= _MMAP_WRITE_THRESHOLD:
+                os.ftruncate(fd, size)
+                with mmap.mmap(fd, size) as mm:
+                    mm[:size] = data
+            elif size:
+                _write_all_vectored(fd, [data])
+            os.lseek(fd, 0, os.SEEK_SET)
+        except BaseException:
+            os.close(fd)
+            raise
+        
+        self._fds[file_id] = fd
+        self._add_file(file_id, f"/proc/self/fd/{fd}", original_filename)
+        return file_id
+    
+    def remove_file(self, file_id: str) -> bool:
+        """
+        指定されたファイルIDのデータを削除
+        
+        Args:
+            file_id: ファイルID
+        
+        Returns:
+            削除が成功したかどうか
+        """
+        fd = self._fds.pop(file_id, None)
+        if fd is None:
+            return super().remove_file(file_id)
+        
+        os.close(fd)
+        self._forget_file(file_id, self._id_to_idx[file_id])
+        return True
+    
+    def _remove_all(self) -> None:
+        """
+        すべての memfd を閉じ、インスタンス専用ディレクトリを削除する
+        """
+        for fd in self._fds.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._fds.clear()
+        super()._remove_all()
+
+
 """
 # 使用例
 def example_usage():
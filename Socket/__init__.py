@@ -1,2 +1,26 @@
 #Py.HagLib.Socket/Socket/__init__.py
 #イニシャライザ
+"""
+簡易ソケット
+
+イベントループを高速化する場合は、TcpServer.start_async / TcpClient.connect_async を呼び出す前に
+install_fast_loop() を呼び出す（uvloop がインストールされている場合のみ有効）。
+"""
+import asyncio
+
+
+def install_fast_loop() -> bool:
+    """
+    uvloop（libuv ベースの高速なイベントループ）を asyncio のイベントループとして設定する
+
+    イベントループを作成する前（asyncio.run の前）に呼び出すこと。
+
+    Returns:
+        uvloop を設定した場合はTrue、uvloop がインストールされていない場合はFalse
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
@@ -0,0 +1,175 @@
+#Py.HagLib.Socket/Socket/_packet_frame.pyx
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+PacketFrame のシリアライズ/デシリアライズの Cython 実装
+
+ビルド方法: cythonize -i Socket/_packet_frame.pyx
+ビルドされていない場合、packet_frame.py は struct を使った純 Python 実装を使用する。
+ヘッダー形式は PacketFrame.HEADER_FORMAT（'<4s4sIIIIII'、32バイト、リトルエンディアン）と同じ。
+
+このモジュールはエンコード/デコード関数のみを提供し、PacketFrame 自体は Python クラス
+（__slots__）のままとする。そのため C 構造体としてのフィールド配置やキャッシュライン境界への
+パディングは行わない（Python オブジェクトのメモリ配置はインタプリタのアロケータが決める）。
+"""
+from cpython.bytes cimport PyBytes_FromStringAndSize, PyBytes_AS_STRING, PyBytes_GET_SIZE
+from libc.stdint cimport uint32_t
+from libc.string cimport memcpy, memset
+
+
+cdef enum:
+    HEADER_SIZE = 32
+
+cdef const char* HEADER_MAGIC = b"hag1"
+cdef uint32_t MAGIC_INT = 0x31676168  # b"hag1" をリトルエンディアンの uint32 として読んだ値
+
+
+cdef inline void _put_u32(char* p, uint32_t v) noexcept nogil:
+    """リトルエンディアンで4バイト書き込む"""
+    p[0] = <char>(v & 0xFF)
+    p[1] = <char>((v >> 8) & 0xFF)
+    p[2] = <char>((v >> 16) & 0xFF)
+    p[3] = <char>((v >> 24) & 0xFF)
+
+
+cdef inline uint32_t _get_u32(const unsigned char* p) noexcept nogil:
+    """リトルエンディアンで4バイト読み込む"""
+    return (<uint32_t>p[0]) | (<uint32_t>p[1] << 8) | (<uint32_t>p[2] << 16) | (<uint32_t>p[3] << 24)
+
+
+def encode_frame(uint32_t destination_group_id, uint32_t destination_user_id,
+                 uint32_t source_group_id, uint32_t source_user_id,
+                 uint32_t payload_type, const unsigned char[::1] payload):
+    """
+    ヘッダーとペイロードを1つのバイト列にシリアライズする
+
+    Args:
+        destination_group_id: 送信先グループID
+        destination_user_id: 送信先ユーザーID
+        source_group_id: 送信元グループID
+        source_user_id: 送信元ユーザーID
+        payload_type: ペイロードタイプ
+        payload: ペイロード（バッファプロトコル対応オブジェクト）
+
+    Returns:
+        ヘッダー(32バイト) + ペイロードのバイト列
+    """
+    cdef Py_ssize_t size = payload.shape[0]
+    if size > 0xFFFFFFFF:
+        raise OverflowError("ペイロードサイズが大きすぎます")
+
+    cdef bytes out = PyBytes_FromStringAndSize(NULL, HEADER_SIZE + size)
+    cdef char* p = PyBytes_AS_STRING(out)
+
+    memcpy(p, HEADER_MAGIC, 4)
+    memset(p + 4, 0, 4)  # 予約領域
+    _put_u32(p + 8, destination_group_id)
+    _put_u32(p + 12, destination_user_id)
+    _put_u32(p + 16, source_group_id)
+    _put_u32(p + 20, source_user_id)
+    _put_u32(p + 24, payload_type)
+    _put_u32(p + 28, <uint32_t>size)
+    if size:
+        memcpy(p + HEADER_SIZE, &payload[0], size)
+    return out
+
+
+def decode_header(data):
+    """
+    バイト列の先頭からヘッダーを読み取る
+
+    Args:
+        data: ヘッダー(32バイト)以上を含むバイト列（バッファプロトコル対応オブジェクト）
+
+    Returns:
+        (送信先グループID, 送信先ユーザーID, 送信元グループID, 送信元ユーザーID, ペイロードタイプ, ペイロードサイズ)
+        のタプル。データサイズ不足またはマジック値が一致しない場合はNone
+    """
+    cdef const unsigned char[::1] view
+    cdef const unsigned char* p
+    cdef Py_ssize_t n
+
+    if type(data) is bytes:
+        # 受信したヘッダーは bytes のため、memoryview を作らずに直接参照する
+        n = PyBytes_GET_SIZE(data)
+        p = <const unsigned char*>PyBytes_AS_STRING(data)
+    else:
+        view = data
+        n = view.shape[0]
+        p = &view[0] if n > 0 else NULL
+
+    if n < HEADER_SIZE:
+        return None
+
+    if _get_u32(p) != MAGIC_INT:
+        return None
+
+    return (_get_u32(p + 8), _get_u32(p + 12), _get_u32(p + 16),
+            _get_u32(p + 20), _get_u32(p + 24), _get_u32(p + 28))
+
+
+def split_chunks(data):
+    """
+    長さ情報(4バイト)付きで連結されたバイト列を分割する
+
+    Args:
+        data: PacketFrameHelper.list_to_byte_array で作成したバイト列（バッファプロトコル対応オブジェクト）
+
+    Returns:
+        分割した各データの memoryview のリスト（元のバイト列を参照し、コピーしない）
+    """
+    cdef list result = []
+    view = memoryview(data)
+    cdef const unsigned char[::1] buf = view
+    cdef Py_ssize_t n = buf.shape[0]
+    cdef Py_ssize_t offset = 0
+    cdef Py_ssize_t length
+
+    while offset < n:
+        if n - offset < 4:
+            raise ValueError("長さ情報が不足しています")
+        length = _get_u32(&buf[offset])
+        offset += 4
+        result.append(view[offset:offset + length])
+        offset += length
+    return result
+
+
+def scan_frames(data):
+    """
+    連続して受信したバイト列から、完全に受信できたパケットの位置をまとめて求める
+
+    Args:
+        data: 受信したバイト列（バッファプロトコル対応オブジェクト）
+
+    Returns:
+        (フレームのリスト, 最初の未完成パケットの位置) のタプル。
+        各フレームは (送信先グループID, 送信先ユーザーID, 送信元グループID, 送信元ユーザーID, ペイロードタイプ,
+        ペイロード開始位置, ペイロード終了位置) のタプル。マジック値が一致しないヘッダーがある場合はNone
+    """
+    cdef const unsigned char[::1] view
+    cdef const unsigned char* p
+    cdef const unsigned char* h
+    cdef Py_ssize_t n
+    cdef Py_ssize_t offset = 0
+    cdef Py_ssize_t end
+    cdef list frames = []
+
+    if type(data) is bytes:
+        n = PyBytes_GET_SIZE(data)
+        p = <const unsigned char*>PyBytes_AS_STRING(data)
+    else:
+        view = data
+        n = view.shape[0]
+        p = &view[0] if n > 0 else NULL
+
+    while n - offset >= HEADER_SIZE:
+        h = p + offset
+        if _get_u32(h) != MAGIC_INT:
+            return None
+        end = offset + HEADER_SIZE + <Py_ssize_t>_get_u32(h + 28)
+        if end > n:
+            break
+        frames.append((_get_u32(h + 8), _get_u32(h + 12), _get_u32(h + 16), _get_u32(h + 20), _get_u32(h + 24),
+                       offset + HEADER_SIZE, end))
+        offset = end
+    return frames, offset
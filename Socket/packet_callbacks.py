@@ -1,10 +1,18 @@
 #Py.HagLib.Socket/Socket/packet_callbacks.py
 
+import asyncio
 from typing import Callable, Dict, List, Optional, Tuple, Any
 from PIL import Image
 from .packet_frame import PacketFrame, PayloadType, debug_print
 
 
+# 受信パケットキューを使う場合の推奨サイズ（PacketProcessor の queue_size に指定する。既定ではキューを使わない）
+DEFAULT_PACKET_QUEUE_SIZE = 1024
+
+# キュー処理時に画像デコードを別スレッドで先に行うペイロードタイプ
+_PREDECODE_IMAGE_TYPES = (PayloadType.PngImage, PayloadType.TextAndPngImage)
+
+
 class IPacketCallbacks:
     """パケット処理のコールバックインターフェース"""
     def raise_first_message(self, message: str) -> None:
@@ -58,89 +66,142 @@ class PacketCallbacksBase(IPacketCallbacks):
         self._log_message_handlers = []
         self._packet_frame_handlers = []
         self._requirement_handlers = []
+        
+        # 発火時に使用するハンドラのタプル（リスナー登録時に更新）
+        self._first_message_handlers_t = ()
+        self._binary_handlers_t = ()
+        self._text_handlers_t = ()
+        self._image_handlers_t = ()
+        self._text_and_image_handlers_t = ()
+        self._complex_data_handlers_t = ()
+        self._log_message_handlers_t = ()
+        self._packet_frame_handlers_t = ()
+        self._requirement_handlers_t = ()
 
     # リスナー登録メソッド
     def add_first_message_listener(self, handler: Callable[[Any, str], None]) -> None:
         self._first_message_handlers.append(handler)
+        self._first_message_handlers_t = tuple(self._first_message_handlers)
         
     def add_binary_listener(self, handler: Callable[[Any, PacketFrame], None]) -> None:
         self._binary_handlers.append(handler)
+        self._binary_handlers_t = tuple(self._binary_handlers)
         
     def add_text_listener(self, handler: Callable[[Any, str, PacketFrame], None]) -> None:
         self._text_handlers.append(handler)
+        self._text_handlers_t = tuple(self._text_handlers)
         
     def add_image_listener(self, handler: Callable[[Any, Image.Image, PacketFrame], None]) -> None:
         self._image_handlers.append(handler)
+        self._image_handlers_t = tuple(self._image_handlers)
         
     def add_text_and_image_listener(self, handler: Callable[[Any, str, Image.Image, PacketFrame], None]) -> None:
         self._text_and_image_handlers.append(handler)
+        self._text_and_image_handlers_t = tuple(self._text_and_image_handlers)
         
     def add_complex_data_listener(self, handler: Callable[[Any, Tuple[List[str], List[Image.Image], List[bytes], PacketFrame]], None]) -> None:
         self._complex_data_handlers.append(handler)
+        self._complex_data_handlers_t = tuple(self._complex_data_handlers)
         
     def add_log_message_listener(self, handler: Callable[[str], None]) -> None:
         self._log_message_handlers.append(handler)
+        self._log_message_handlers_t = tuple(self._log_message_handlers)
         
     def add_packet_frame_listener(self, handler: Callable[[Any, PacketFrame, PacketFrame], None]) -> None:
         self._packet_frame_handlers.append(handler)
+        self._packet_frame_handlers_t = tuple(self._packet_frame_handlers)
         
     def add_requirement_listener(self, handler: Callable[[Any, Tuple[List[str], List[Image.Image], List[bytes], PacketFrame]], None]) -> None:
         self._requirement_handlers.append(handler)
+        self._requirement_handlers_t = tuple(self._requirement_handlers)
 
     # イベント発火メソッド
     def raise_first_message(self, message: str) -> None:
-        for handler in self._first_message_handlers:
+        for handler in self._first_message_handlers_t:
             handler(self, message)
             
     def raise_binary(self, packet: PacketFrame) -> None:
-        for handler in self._binary_handlers:
+        for handler in self._binary_handlers_t:
             handler(self, packet)
             
     def raise_text(self, message: str, packet: PacketFrame) -> None:
-        for handler in self._text_handlers:
+        for handler in self._text_handlers_t:
             handler(self, message, packet)
             
     def raise_image(self, image: Image.Image, packet: PacketFrame) -> None:
-        for handler in self._image_handlers:
+        for handler in self._image_handlers_t:
             handler(self, image, packet)
             
     def raise_text_and_image(self, message: str, image: Image.Image, packet: PacketFrame) -> None:
-        for handler in self._text_and_image_handlers:
+        for handler in self._text_and_image_handlers_t:
             handler(self, message, image, packet)
             
     def raise_complex_data(self, complex_data: Tuple[List[str], List[Image.Image], List[bytes], PacketFrame]) -> None:
-        for handler in self._complex_data_handlers:
+        for handler in self._complex_data_handlers_t:
             handler(self, complex_data)
             
     def raise_log_message(self, message: str) -> None:
-        for handler in self._log_message_handlers:
+        for handler in self._log_message_handlers_t:
             handler(message)
             
     def raise_packet_frame(self, child_packet: PacketFrame, packet: PacketFrame) -> None:
-        for handler in self._packet_frame_handlers:
+        for handler in self._packet_frame_handlers_t:
             handler(self, child_packet, packet)
             
     def raise_requirement(self, complex_data: Tuple[List[str], List[Image.Image], List[bytes], PacketFrame]) -> None:
-        for handler in self._requirement_handlers:
+        for handler in self._requirement_handlers_t:
             handler(self, complex_data)
 
 
 class PacketProcessor:
     """パケット処理クラス"""
+    __slots__ = ('_callbacks_source', '_queue_size', '_queue', '_consumer_task', '_dispatch')
     
-    def __init__(self, callbacks_source: 'PacketCallbacksBase'):
+    def __init__(self, callbacks_source: 'PacketCallbacksBase', queue_size: int = 0):
         """
         PacketProcessorのコンストラクタ
         
         Args:
             callbacks_source: コールバックを提供するオブジェクト
+            queue_size: 受信パケットキューのサイズ。0の場合はキューを使わず受信側で同期的に処理する。
+                        1以上の場合、process_packet_async はパケットをキューに積み、
+                        別タスクでデコードとイベント発火を行う（キューが満杯の場合は空きができるまで待機する）
         """
         self._callbacks_source = callbacks_source
+        self._queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer_task: Optional[asyncio.Task] = None
+        
+        # ペイロードタイプ -> 処理メソッドのディスパッチテーブル
+        self._dispatch: Dict[int, Callable[[PacketFrame], None]] = {
+            PayloadType.PlainText: self._h_text,
+            PayloadType.PngImage: self._h_image,
+            PayloadType.TextAndPngImage: self._h_text_and_image,
+            PayloadType.Complex: self._h_complex,
+            PayloadType.PacketFrame: self._h_packet_frame,
+            PayloadType.Requirement: self._h_requirement,
+        }
         
     def process_packet(self, packet_data: PacketFrame, context: str = "") -> None:
+        """
+        受信したパケットを同期的に処理し、適切なイベントを発火する（受信キューは使わない）
+        
+        Args:
+            packet_data: 処理するパケット
+            context: コンテキスト情報（ログ用）
+        """
+        if packet_data is None:
+            return
+            
+        self._dispatch_packet(packet_data)
+        
+    async def process_packet_async(self, packet_data: PacketFrame, context: str = "") -> None:
         """
         受信したパケットを処理し、適切なイベントを発火する
         
+        受信キューを使う場合はキューに積み、処理は別タスクで受信順に行う。キューが満杯の場合は空きができるまで待機する
+        （受信ループを待たせることで送信元に背圧をかける）。同じ接続のパケットに process_packet と混在させないこと。
+        
         Args:
             packet_data: 処理するパケット
             context: コンテキスト情報（ログ用）
@@ -148,45 +209,95 @@ class PacketProcessor:
         if packet_data is None:
             return
             
-        if packet_data.payload_type == PayloadType.PlainText:
-            # テキストメッセージの処理
-            message = packet_data.message
-            if message:
-                # 接続要求メッセージの場合はテキストイベントを発火しない
-                if message.startswith("CONNECT:"):
-                    debug_print(f"接続要求メッセージを検出: {message}")
-                    # ログメッセージとして記録するだけで、テキストイベントは発火しない
-                    self._callbacks_source.raise_log_message(f"クライアント接続要求: {message}")
-                else:
-                    # 通常のテキストメッセージとして処理
-                    self._callbacks_source.raise_text(message, packet_data)
-                
-        elif packet_data.payload_type == PayloadType.PngImage:
-            # PNG画像の処理
-            image = packet_data.to_image()
-            if image:
-                self._callbacks_source.raise_image(image, packet_data)
+        if self._queue_size <= 0:
+            self._dispatch_packet(packet_data)
+            return
+            
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._queue_size)
+        if self._consumer_task is None or self._consumer_task.done():
+            self._consumer_task = asyncio.get_running_loop().create_task(self._consume(self._queue))
+        await self._queue.put(packet_data)
+        
+    def _dispatch_packet(self, packet_data: PacketFrame) -> None:
+        """パケットのペイロードタイプに応じた処理を呼び出す"""
+        # 未知のペイロードタイプはバイナリデータとして処理（デフォルト）
+        handler = self._dispatch.get(packet_data.payload_type, self._h_binary)
+        handler(packet_data)
+        
+    async def _consume(self, queue: asyncio.Queue) -> None:
+        """受信キューからパケットを取り出して処理し続けるループ（close() 後はキューに残ったパケットを処理してから終了する）"""
+        while True:
+            packet_data = await queue.get()
+            if packet_data is None:
+                return  # close() が積んだ終了の目印
+            try:
+                # 画像のデコードはイベントループを止めないよう別スレッドで行う（結果はパケットにキャッシュされる）
+                if packet_data.payload_type in _PREDECODE_IMAGE_TYPES:
+                    await asyncio.to_thread(packet_data.to_image)
+                self._dispatch_packet(packet_data)
+            except Exception as e:
+                self._callbacks_source.raise_log_message(f"パケット処理中にエラーが発生: {e}")
+            finally:
+                queue.task_done()
+            if self._queue is not queue and queue.empty():
+                return  # close() 後、キューが満杯で終了の目印を積めなかった場合
                 
-        elif packet_data.payload_type == PayloadType.TextAndPngImage:
-            # テキストと画像の複合データの処理
-            text, img = packet_data.to_text_and_image()
-            if img:
-                self._callbacks_source.raise_text_and_image(text or "", img, packet_data)
+    def close(self) -> None:
+        """
+        受信キューの処理タスクを停止する
+        
+        キューに残っているパケットは破棄せず、処理タスクがすべて処理してから終了する。
+        """
+        queue = self._queue
+        self._queue = None
+        self._consumer_task = None
+        if queue is not None:
+            try:
+                queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+        
+    def _h_text(self, packet_data: PacketFrame) -> None:
+        """テキストメッセージの処理"""
+        callbacks = self._callbacks_source
+        message = packet_data.message
+        if message:
+            # 接続要求メッセージの場合はテキストイベントを発火しない
+            if message.startswith("CONNECT:"):
+                debug_print(f"接続要求メッセージを検出: {message}")
+                # ログメッセージとして記録するだけで、テキストイベントは発火しない
+                callbacks.raise_log_message(f"クライアント接続要求: {message}")
+            else:
+                # 通常のテキストメッセージとして処理
+                callbacks.raise_text(message, packet_data)
                 
-        elif packet_data.payload_type == PayloadType.Complex:
-            # 複合データの処理
-            self._callbacks_source.raise_complex_data(packet_data.to_complex())
+    def _h_image(self, packet_data: PacketFrame) -> None:
+        """PNG画像の処理"""
+        image = packet_data.to_image()
+        if image:
+            self._callbacks_source.raise_image(image, packet_data)
             
-        elif packet_data.payload_type == PayloadType.PacketFrame:
-            # パケットデータの処理
-            child_packet = packet_data.to_packet_frame()
-            if child_packet:
-                self._callbacks_source.raise_packet_frame(child_packet, packet_data)
+    def _h_text_and_image(self, packet_data: PacketFrame) -> None:
+        """テキストと画像の複合データの処理"""
+        text, img = packet_data.to_text_and_image()
+        if img:
+            self._callbacks_source.raise_text_and_image(text or "", img, packet_data)
             
-        elif packet_data.payload_type == PayloadType.Requirement:
-            # オーダーデータの処理
-            self._callbacks_source.raise_requirement(packet_data.to_requirement())
+    def _h_complex(self, packet_data: PacketFrame) -> None:
+        """複合データの処理"""
+        self._callbacks_source.raise_complex_data(packet_data.to_complex())
+        
+    def _h_packet_frame(self, packet_data: PacketFrame) -> None:
+        """パケットデータの処理"""
+        child_packet = packet_data.to_packet_frame()
+        if child_packet:
+            self._callbacks_source.raise_packet_frame(child_packet, packet_data)
             
-        else:
-            # バイナリデータの処理（デフォルト）
-            self._callbacks_source.raise_binary(packet_data)
+    def _h_requirement(self, packet_data: PacketFrame) -> None:
+        """オーダーデータの処理"""
+        self._callbacks_source.raise_requirement(packet_data.to_requirement())
+        
+    def _h_binary(self, packet_data: PacketFrame) -> None:
+        """バイナリデータの処理"""
+        self._callbacks_source.raise_binary(packet_data)
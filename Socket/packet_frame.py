@@ -1,10 +1,25 @@
 #Py.HagLib.Socket/Socket/packet_frame.py
+import base64
+import concurrent.futures
+import os
 import struct
 from enum import IntEnum
-from typing import List, Tuple, Optional, Dict, Any
+from itertools import chain
+from typing import Iterable, List, Tuple, Optional, Dict, Any, Union
 from io import BytesIO
 from PIL import Image
 
+# Cython 版のシリアライズ処理（cythonize -i Socket/_packet_frame.pyx でビルド）。
+# ビルドされていない場合は struct を使った純 Python 実装を使用する
+try:
+    from ._packet_frame import encode_frame as _encode_frame, decode_header as _decode_header, \
+        split_chunks as _split_chunks, scan_frames as _scan_frames
+except ImportError:
+    _encode_frame = None
+    _decode_header = None
+    _split_chunks = None
+    _scan_frames = None
+
 
 # デバッグ用のフラグ
 DEBUG = True
@@ -16,10 +31,48 @@ def debug_print(message):
         print(f"[DEBUG] {message}")
 
 
+# PNG エンコード時の保存オプション。圧縮レベルは速度を優先して 1 にする
+# （既定の 6 と比べてサイズはやや大きくなるが、エンコードの大半を占める deflate が大幅に速くなる）。
+# さらに高速化する場合は Pillow の代わりに Pillow-SIMD をインストールする
+_PNG_SAVE_KW = {'format': 'PNG', 'compress_level': 1}
+
+# 複数画像の PNG エンコード用スレッドプール（エンコード中は Pillow が GIL を解放するため並列化できる）
+_PNG_ENCODE_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 4,
+    thread_name_prefix="PacketFramePng"
+)
+
+# 空のペイロード（すべての空ペイロードで共有する）
+_EMPTY: bytes = b""
+
+# Base64 の data URL ヘッダー
+_BASE64_PNG_HEADER = b"data:image/png;base64,"
+
+# 長さ情報(4バイト)と複合データのカウント情報(4バイト×3)の書式
+_U32_STRUCT = struct.Struct('<I')
+_COMPLEX_COUNTS_STRUCT = struct.Struct('<III')
+_HANDSHAKE_STRUCT = struct.Struct('<II')  # ハンドシェイクのペイロード（ユーザーID, グループID）
+
+
+def _byte_payload(value: Union[bytes, memoryview]) -> Union[bytes, memoryview]:
+    """
+    ペイロードを1バイト単位のバッファとして保持する形に揃える
+    
+    要素が1バイトでない memoryview（array('I') のビューなど）は len() がバイト数にならず、
+    Cython の encode_frame も受け付けないため、バイト単位のビューに変換する（コピーはしない）
+    """
+    if not value:
+        return _EMPTY
+    if type(value) is memoryview and (value.format != 'B' or value.ndim != 1):
+        return value.cast('B')
+    return value
+
+
 class PayloadType(IntEnum):
     """パケットのペイロードタイプを定義するEnum"""
     BinaryRaw = 0
     PlainText = 1  # 推奨
+    Handshake = 2  # 接続時にクライアントがユーザーID・グループIDを通知する
     PngImage = 8000
     TextAndPngImage = 8001
     Complex = 10000  # 推奨
@@ -27,6 +80,10 @@ class PayloadType(IntEnum):
     Requirement = 30000  # 推奨
 
 
+# 値 -> PayloadType の対応表（受信時に毎回 PayloadType(値) を生成しないようにする）
+_PT_BY_VALUE: Dict[int, PayloadType] = {int(v): v for v in PayloadType}
+
+
 class PacketFrameHelper:
     """PacketFrameのユーティリティメソッドを提供するヘルパークラス"""
 
@@ -39,34 +96,44 @@ class PacketFrameHelper:
         if not list_of_byte_arrays:
             return b''
 
-        result = bytearray()
-        for array in list_of_byte_arrays:
-            # 配列のサイズを4バイトで格納
-            result.extend(struct.pack('<I', len(array)))
-            # 配列本体を格納
-            result.extend(array)
+        return PacketFrameHelper.pack_chunks(list_of_byte_arrays)
 
-        return bytes(result)
+    @staticmethod
+    def pack_chunks(chunks: Iterable[bytes]) -> bytes:
+        """
+        複数のバイト配列を、それぞれの前に長さ情報(4バイト)を付加して1つのバイト列に連結する
+        
+        長さ情報とデータを交互に並べたリストを b''.join で一度に連結するため、
+        結果のバイト列は1回の確保・1回のコピーで作成される
+        """
+        pack = _U32_STRUCT.pack
+        return b''.join([part for chunk in chunks for part in (pack(len(chunk)), chunk)])
 
     @staticmethod
-    def byte_array_to_list(byte_array: bytes) -> List[bytes]:
+    def byte_array_to_list(byte_array: Union[bytes, memoryview]) -> List[memoryview]:
         """
         1つのバイト配列から複数のバイト配列に変換する
         各配列の前に付加されている長さ情報(4バイト)を使用して分割する
+        分割結果は元のバイト配列をコピーせずに参照する memoryview となる
         """
         result = []
         if not byte_array:
             return result
 
+        if _split_chunks is not None:
+            return _split_chunks(byte_array)
+
+        view = memoryview(byte_array)
+        unpack_from = _U32_STRUCT.unpack_from
+        total = len(view)
         offset = 0
-        while offset < len(byte_array):
+        while offset < total:
             # 配列サイズを取得
-            length = struct.unpack('<I', byte_array[offset:offset+4])[0]
+            length = unpack_from(view, offset)[0]
             offset += 4
 
             # 指定サイズのbyte配列を取得
-            single_array = byte_array[offset:offset+length]
-            result.append(single_array)
+            result.append(view[offset:offset+length])
             offset += length
 
         return result
@@ -76,10 +143,18 @@ class PacketFrame:
     """
     ネットワークパケットのヘッダー＋ペイロードを表現するクラス
     """
+    # パケットごとに生成されるため、__dict__ を持たないようにする
+    __slots__ = ('destination_group_id', 'destination_user_id', 'source_group_id', 'source_user_id',
+                 'payload_type', '_payload', '_cached_image', '_parsed_complex', '_complex_images')
+
     HEADER_MAGIC = b'hag1'
     HEADER_FORMAT = '<4s4sIIIIII'  # シグネチャ(4バイト)、予約(4バイト)、送信先グループID(4バイト)、送信先ユーザーID(4バイト)、
                              # 送信元グループID(4バイト)、送信元ユーザーID(4バイト)、ペイロードタイプ(4バイト)、ペイロードサイズ(4バイト)
     HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+    # 送受信時はシグネチャと予約領域も uint32 として扱う（バイト配置は HEADER_FORMAT と同じ）。
+    # シグネチャの比較を整数1回の比較で行えるようにするため
+    _HEADER_STRUCT = struct.Struct('<IIIIIIII')  # 書式を毎回解析しないようにコンパイル済みの Struct を使う
+    _MAGIC_INT = struct.unpack('<I', HEADER_MAGIC)[0]  # 0x31676168
 
     def __init__(self,
                  destination_group_id: int = 0,
@@ -87,13 +162,29 @@ class PacketFrame:
                  source_group_id: int = 0,
                  source_user_id: int = 0xFFFF,
                  payload_type: PayloadType = PayloadType.BinaryRaw,
-                 payload: bytes = b""):
+                 payload: Union[bytes, memoryview] = b""):
         self.destination_group_id = destination_group_id
         self.destination_user_id = destination_user_id
         self.source_group_id = source_group_id
         self.source_user_id = source_user_id
         self.payload_type = payload_type
-        self.payload = payload or b""
+        self._payload = _byte_payload(payload)
+        self._cached_image: Optional[Image.Image] = None  # デコード済み画像のキャッシュ
+        self._parsed_complex: Optional[tuple] = None  # to_complex_raw の解析結果のキャッシュ
+        self._complex_images: Optional[List[Image.Image]] = None  # to_complex でデコードした画像のキャッシュ
+
+    @property
+    def payload(self) -> Union[bytes, memoryview]:
+        """ペイロード（bytes、または1バイト単位の memoryview）"""
+        return self._payload
+
+    @payload.setter
+    def payload(self, value: Union[bytes, memoryview]) -> None:
+        # ペイロードが変わった場合は解析結果のキャッシュを破棄する
+        self._payload = _byte_payload(value)
+        self._cached_image = None
+        self._parsed_complex = None
+        self._complex_images = None
 
     @property
     def payload_size(self) -> int:
@@ -104,11 +195,27 @@ class PacketFrame:
         """
         PacketFrame をバイト列にシリアライズする。ヘッダー + ペイロード。
         """
-        reserved = b'\x00\x00\x00\x00'  # 予約領域を4バイトのゼロで埋める
-        header = struct.pack(
-            self.HEADER_FORMAT,
-            self.HEADER_MAGIC,
-            reserved,
+        if _encode_frame is not None:
+            return _encode_frame(self.destination_group_id, self.destination_user_id,
+                                 self.source_group_id, self.source_user_id,
+                                 int(self.payload_type), self.payload)
+        
+        header, payload = self.to_iovec()
+        return header + payload
+
+    def to_iovec(self) -> Tuple[bytes, Union[bytes, memoryview]]:
+        """
+        PacketFrame をヘッダーとペイロードに分けてシリアライズする
+        
+        ペイロードは連結せずにそのまま返すため、writelines / sendmsg などの
+        複数バッファをまとめて送信する書き込みにコピーなしで渡せる
+        
+        Returns:
+            (ヘッダー(32バイト), ペイロード)のタプル
+        """
+        header = self._HEADER_STRUCT.pack(
+            self._MAGIC_INT,
+            0,  # 予約領域
             self.destination_group_id,
             self.destination_user_id,
             self.source_group_id,
@@ -116,50 +223,111 @@ class PacketFrame:
             int(self.payload_type),
             self.payload_size
         )
-        debug_print(f"シリアライズ: ヘッダーサイズ={len(header)}, マジック={self.HEADER_MAGIC}, " + 
-                    f"送信先グループID={self.destination_group_id}, 送信先ユーザーID={self.destination_user_id}, " +
-                    f"送信元グループID={self.source_group_id}, 送信元ユーザーID={self.source_user_id}, " +
-                    f"ペイロードタイプ={self.payload_type}, ペイロードサイズ={self.payload_size}")
-        return header + self.payload
+        # デバッグ無効時はメッセージの組み立て自体を行わない
+        if DEBUG:
+            debug_print(f"シリアライズ: {self.repr_header()}")
+        return header, self.payload
+
+    def to_buffer(self) -> memoryview:
+        """
+        PacketFrame をシリアライズしたバッファを返す。ヘッダー + ペイロード。
+        
+        ヘッダーとペイロードを1つのバッファに直接書き込み、bytes への変換を行わない。
+        ソケットへの書き込みなど、そのまま読み出すだけの用途に使用する。
+        """
+        if _encode_frame is not None:
+            return memoryview(self.to_bytes())
+        
+        buf = bytearray(self.HEADER_SIZE + self.payload_size)
+        self.pack_into(buf, 0)
+        return memoryview(buf)
+
+    def pack_into(self, buf: bytearray, offset: int = 0) -> int:
+        """
+        PacketFrame を指定したバッファの offset の位置に直接シリアライズする
+        
+        ヘッダーは struct.pack_into で書き込み、ペイロードはスライス代入でコピーするため、
+        途中で bytes オブジェクトを生成しない。
+        
+        Args:
+            buf: 書き込み先のバッファ（offset + HEADER_SIZE + ペイロードサイズ 以上の長さが必要）
+            offset: 書き込みを開始する位置
+        
+        Returns:
+            書き込んだバイト数（ヘッダー + ペイロード）
+        """
+        payload_size = self.payload_size
+        self._HEADER_STRUCT.pack_into(
+            buf,
+            offset,
+            self._MAGIC_INT,
+            0,  # 予約領域
+            self.destination_group_id,
+            self.destination_user_id,
+            self.source_group_id,
+            self.source_user_id,
+            int(self.payload_type),
+            payload_size
+        )
+        start = offset + self.HEADER_SIZE
+        buf[start:start + payload_size] = self.payload
+        if DEBUG:
+            debug_print(f"シリアライズ: {self.repr_header()}")
+        return self.HEADER_SIZE + payload_size
+
+    def repr_header(self) -> str:
+        """ヘッダー内容をデバッグ表示用の文字列にする"""
+        return (f"マジック={self.HEADER_MAGIC}, " +
+                f"送信先グループID={self.destination_group_id}, 送信先ユーザーID={self.destination_user_id}, " +
+                f"送信元グループID={self.source_group_id}, 送信元ユーザーID={self.source_user_id}, " +
+                f"ペイロードタイプ={self.payload_type}, ペイロードサイズ={self.payload_size}")
 
     @classmethod
     def from_bytes(cls, data: bytes) -> Optional['PacketFrame']:
         """
         バイト列から PacketFrame を逆シリアライズする。
         data はヘッダー(32バイト) + payload_size バイト以上を含む必要がある。
+        ペイロードは bytes としてコピーする（パケットが受信バッファ全体を保持し続けないようにする）。
         """
         if len(data) < cls.HEADER_SIZE:
             debug_print(f"データサイズ不足: {len(data)} < {cls.HEADER_SIZE}")
             return None
             
         try:
-            unpacked = struct.unpack(cls.HEADER_FORMAT, data[:cls.HEADER_SIZE])
-            magic, reserved, dest_grp, dest_usr, src_grp, src_usr, ptype, psize = unpacked
-            
-            debug_print(f"デシリアライズ: マジック={magic}, " + 
-                        f"送信先グループID={dest_grp}, 送信先ユーザーID={dest_usr}, " +
-                        f"送信元グループID={src_grp}, 送信元ユーザーID={src_usr}, " +
-                        f"ペイロードタイプ={ptype}, ペイロードサイズ={psize}")
-                        
-            if magic != cls.HEADER_MAGIC:
-                debug_print(f"無効なマジック値: {magic} != {cls.HEADER_MAGIC}")
-                return None
+            if _decode_header is not None:
+                header = _decode_header(data)
+                if header is None:
+                    debug_print(f"無効なマジック値: {bytes(data[:4])} != {cls.HEADER_MAGIC}")
+                    return None
+                dest_grp, dest_usr, src_grp, src_usr, ptype, psize = header
+            else:
+                # スライスを作らずにバッファから直接読み取る
+                unpacked = cls._HEADER_STRUCT.unpack_from(data, 0)
+                magic, reserved, dest_grp, dest_usr, src_grp, src_usr, ptype, psize = unpacked
+                
+                if magic != cls._MAGIC_INT:
+                    debug_print(f"無効なマジック値: {bytes(data[:4])} != {cls.HEADER_MAGIC}")
+                    return None
                 
             # データに含まれるペイロードサイズをチェック
             if len(data) < cls.HEADER_SIZE + psize:
                 debug_print(f"ペイロードサイズ不足: {len(data) - cls.HEADER_SIZE} < {psize}")
                 return None
                 
-            payload = data[cls.HEADER_SIZE:cls.HEADER_SIZE + psize]
+            # 制御メッセージなどの空のペイロードはコピーせずに共有の空バイト列を使う
+            payload = bytes(memoryview(data)[cls.HEADER_SIZE:cls.HEADER_SIZE + psize]) if psize else _EMPTY
                 
-            return cls(
+            packet = cls(
                 destination_group_id=dest_grp,
                 destination_user_id=dest_usr,
                 source_group_id=src_grp,
                 source_user_id=src_usr,
-                payload_type=PayloadType(ptype),
+                payload_type=_PT_BY_VALUE.get(ptype, ptype),  # 未定義のタイプは int のまま保持
                 payload=payload
             )
+            if DEBUG:
+                debug_print(f"デシリアライズ: {packet.repr_header()}")
+            return packet
         except Exception as e:
             debug_print(f"デシリアライズエラー: {e}")
             return None
@@ -176,6 +344,18 @@ class PacketFrame:
                    source_group_id, source_user_id,
                    PayloadType.PlainText, payload)
 
+    @classmethod
+    def from_handshake(cls, user_id: int, group_id: int) -> 'PacketFrame':
+        """
+        接続時のハンドシェイク（サーバー宛て）のPacketFrameを作成する
+        
+        Args:
+            user_id: クライアントのユーザーID
+            group_id: クライアントのグループID
+        """
+        return cls(0, 0, group_id, user_id,
+                   PayloadType.Handshake, _HANDSHAKE_STRUCT.pack(user_id, group_id))
+
     @classmethod
     def from_bytes_raw(cls, raw: bytes,
                        destination_group_id: int = 0,
@@ -194,9 +374,7 @@ class PacketFrame:
                    source_group_id: int = 0,
                    source_user_id: int = 0xFFFF) -> 'PacketFrame':
         """画像からPacketFrameを作成する"""
-        buf = BytesIO()
-        image.save(buf, format='PNG')
-        payload = buf.getvalue()
+        payload = cls.encode_image(image)
         return cls(destination_group_id, destination_user_id,
                    source_group_id, source_user_id,
                    PayloadType.PngImage, payload)
@@ -210,9 +388,7 @@ class PacketFrame:
         """テキストと画像からPacketFrameを作成する"""
         text_data = text.encode('utf-8')
         
-        buf = BytesIO()
-        image.save(buf, format='PNG')
-        image_data = buf.getvalue()
+        image_data = cls.encode_image(image)
         
         payload = PacketFrameHelper.list_to_byte_array([text_data, image_data])
         
@@ -238,89 +414,151 @@ class PacketFrame:
         text_bytes = [text.encode('utf-8') for text in texts]
         
         # 画像をPNGフォーマットのバイト配列に変換
-        image_bytes = []
-        for img in images:
-            buf = BytesIO()
-            img.save(buf, format='PNG')
-            image_bytes.append(buf.getvalue())
+        if len(images) > 1:
+            # 複数の画像はスレッドプールで並列にエンコード
+            image_bytes = list(_PNG_ENCODE_POOL.map(cls.encode_image, images))
+        else:
+            image_bytes = [cls.encode_image(img) for img in images]
         
         # カウント情報を作成
-        counts = struct.pack('<III', len(text_bytes), len(image_bytes), len(binary_data))
-        
-        # すべてのデータを1つのリストにまとめる
-        all_data = [counts] + text_bytes + image_bytes + binary_data
+        counts = _COMPLEX_COUNTS_STRUCT.pack(len(text_bytes), len(image_bytes), len(binary_data))
         
-        # リストをバイト配列に変換
-        payload = PacketFrameHelper.list_to_byte_array(all_data)
+        # 中間リストを作らずにすべてのデータを1つのバイト列に連結
+        payload = PacketFrameHelper.pack_chunks(chain((counts,), text_bytes, image_bytes, binary_data))
         
         return cls(destination_group_id, destination_user_id,
                    source_group_id, source_user_id,
                    PayloadType.Complex, payload)
 
+    # ---- ペイロードタイプごとの取り出し処理（タイプ -> 処理の表で分岐する） ----
+
+    def _text_plain(self) -> Optional[str]:
+        return str(self.payload, 'utf-8', 'ignore')
+
+    def _text_text_and_image(self) -> Optional[str]:
+        parts = PacketFrameHelper.byte_array_to_list(self.payload)
+        if len(parts) >= 1:
+            return str(parts[0], 'utf-8', 'ignore')
+        return None
+
+    def _text_complex(self) -> Optional[str]:
+        texts, _, _, _ = self.to_complex_raw()
+        if texts:
+            return texts[0]
+        return None
+
+    def _image_data_png(self) -> Optional[memoryview]:
+        return self.payload
+
+    def _image_data_text_and_image(self) -> Optional[memoryview]:
+        parts = PacketFrameHelper.byte_array_to_list(self.payload)
+        if len(parts) >= 2:
+            return parts[1]
+        return None
+
+    def _image_data_complex(self) -> Optional[memoryview]:
+        # 格納されている PNG データをそのまま使う（デコードと再エンコードを行わない）
+        _, image_bytes, _, _ = self.to_complex_raw()
+        if image_bytes:
+            return image_bytes[0]
+        return None
+
+    # ペイロードタイプ -> 先頭のテキストを取り出す処理
+    _TEXT_HANDLERS: Dict[int, Any] = {
+        PayloadType.PlainText: _text_plain,
+        PayloadType.TextAndPngImage: _text_text_and_image,
+        PayloadType.Complex: _text_complex,
+    }
+
+    # ペイロードタイプ -> 先頭の画像の PNG データを取り出す処理
+    _IMAGE_DATA_HANDLERS: Dict[int, Any] = {
+        PayloadType.PngImage: _image_data_png,
+        PayloadType.TextAndPngImage: _image_data_text_and_image,
+        PayloadType.Complex: _image_data_complex,
+    }
+
+    def _first_text(self) -> Optional[str]:
+        """先頭のテキストを取り出す（テキストを含まない場合はNone）"""
+        handler = self._TEXT_HANDLERS.get(self.payload_type)
+        return handler(self) if handler is not None else None
+
+    def _first_image_data(self) -> Optional[memoryview]:
+        """先頭の画像の PNG データを取り出す（画像を含まない場合はNone）"""
+        handler = self._IMAGE_DATA_HANDLERS.get(self.payload_type)
+        return handler(self) if handler is not None else None
+
     def to_text(self) -> str:
         """PlainTextタイプのペイロードからテキストを取り出す"""
-        if self.payload_type == PayloadType.PlainText:
-            return self.payload.decode('utf-8', errors='ignore')
-        elif self.payload_type == PayloadType.TextAndPngImage:
-            parts = PacketFrameHelper.byte_array_to_list(self.payload)
-            if len(parts) >= 1:
-                return parts[0].decode('utf-8', errors='ignore')
-        elif self.payload_type == PayloadType.Complex:
-            texts, _, _, _ = self.to_complex()
-            if texts:
-                return texts[0]
-        return ''
+        text = self._first_text()
+        return text if text is not None else ''
 
     def to_image(self) -> Optional[Image.Image]:
-        """画像を取り出す"""
-        if self.payload_type == PayloadType.PngImage:
-            return Image.open(BytesIO(self.payload))
-        elif self.payload_type == PayloadType.TextAndPngImage:
-            parts = PacketFrameHelper.byte_array_to_list(self.payload)
-            if len(parts) >= 2:
-                return Image.open(BytesIO(parts[1]))
-        elif self.payload_type == PayloadType.Complex:
-            _, images, _, _ = self.to_complex()
-            if images:
-                return images[0]
-        return None
+        """画像を取り出す（デコード結果はパケットにキャッシュされる）"""
+        if self._cached_image is None:
+            self._cached_image = self._decode_image()
+        return self._cached_image
+
+    def _decode_image(self) -> Optional[Image.Image]:
+        """ペイロードから画像をデコードする"""
+        image_data = self._first_image_data()
+        if image_data is None:
+            return None
+        return self.decode_image(image_data)
 
     def to_text_and_image(self) -> Tuple[Optional[str], Optional[Image.Image]]:
         """テキストと画像を取り出す"""
-        text = None
-        image = None
-        
-        if self.payload_type == PayloadType.TextAndPngImage:
-            parts = PacketFrameHelper.byte_array_to_list(self.payload)
-            if len(parts) >= 1:
-                text = parts[0].decode('utf-8', errors='ignore')
-            if len(parts) >= 2:
-                image = Image.open(BytesIO(parts[1]))
-        elif self.payload_type == PayloadType.PlainText:
-            text = self.payload.decode('utf-8', errors='ignore')
-        elif self.payload_type == PayloadType.PngImage:
-            image = Image.open(BytesIO(self.payload))
-        elif self.payload_type == PayloadType.Complex:
-            texts, images, _, _ = self.to_complex()
-            if texts:
-                text = texts[0]
-            if images:
-                image = images[0]
-                
-        return text, image
+        return self._first_text(), self.to_image()
 
     def to_complex(self) -> Tuple[List[str], List[Image.Image], List[bytes], 'PacketFrame']:
-        """複合データを取り出す"""
+        """
+        複合データを取り出す
+        
+        バイナリデータはペイロードを参照する memoryview ではなく bytes として返す
+        （イベントの受け取り側がペイロード全体を保持し続けないようにする）。
+        画像の読み込みは Image.open のため、ピクセルデータは最初に使用されたときにデコードされる
+        """
+        texts, image_bytes, binaries, _ = self.to_complex_raw()
+        if self._complex_images is None:
+            self._complex_images = [self.decode_image(data) for data in image_bytes]
+        return list(texts), list(self._complex_images), [bytes(data) for data in binaries], self
+
+    @staticmethod
+    def encode_image(image: Image.Image) -> bytes:
+        """画像を PNG データにエンコードする"""
+        buf = BytesIO()
+        image.save(buf, **_PNG_SAVE_KW)
+        return buf.getvalue()
+
+    @staticmethod
+    def decode_image(data: Union[bytes, memoryview]) -> Image.Image:
+        """PNG データを画像にデコードする"""
+        return Image.open(BytesIO(data))
+
+    def to_complex_raw(self) -> Tuple[List[str], List[memoryview], List[memoryview], 'PacketFrame']:
+        """
+        複合データを取り出す（画像はデコードせず、PNG のバイト列のまま返す）
+        
+        解析結果はパケットにキャッシュされ、同じリストを返すため変更しないこと
+        
+        Returns:
+            (テキストのリスト, PNG データのリスト, バイナリデータのリスト, パケット自身)のタプル
+        """
         if self.payload_type != PayloadType.Complex:
             return [], [], [], self
-            
+        
+        if self._parsed_complex is None:
+            self._parsed_complex = self._parse_complex()
+        return self._parsed_complex
+
+    def _parse_complex(self) -> Tuple[List[str], List[memoryview], List[memoryview], 'PacketFrame']:
+        """複合データのペイロードを解析する"""
         parts = PacketFrameHelper.byte_array_to_list(self.payload)
         if not parts:
             return [], [], [], self
             
         # カウント情報を取得
         counts_data = parts[0]
-        text_count, image_count, binary_count = struct.unpack('<III', counts_data)
+        text_count, image_count, binary_count = _COMPLEX_COUNTS_STRUCT.unpack(counts_data)
         
         all_items = parts[1:]
         current_index = 0
@@ -329,14 +567,14 @@ class PacketFrame:
         texts = []
         for i in range(text_count):
             if current_index < len(all_items):
-                texts.append(all_items[current_index].decode('utf-8', errors='ignore'))
+                texts.append(str(all_items[current_index], 'utf-8', 'ignore'))
                 current_index += 1
             
         # 画像を取り出す
-        images = []
+        image_bytes = []
         for i in range(image_count):
             if current_index < len(all_items):
-                images.append(Image.open(BytesIO(all_items[current_index])))
+                image_bytes.append(all_items[current_index])
                 current_index += 1
             
         # バイナリデータを取り出す
@@ -346,7 +584,7 @@ class PacketFrame:
                 binaries.append(all_items[current_index])
                 current_index += 1
                 
-        return texts, images, binaries, self
+        return texts, image_bytes, binaries, self
 
     def to_packet_frame(self) -> Optional['PacketFrame']:
         """PacketFrameタイプのペイロードからPacketFrameを取り出す"""
@@ -361,38 +599,43 @@ class PacketFrame:
             return self.to_complex()
         return [], [], [], self
 
-    def to_base64_image(self, with_header: bool = True) -> str:
-        """画像をBase64文字列として取り出す"""
-        import base64
+    def to_handshake(self) -> Optional[Tuple[int, int]]:
+        """
+        ハンドシェイクのユーザーIDとグループIDを取り出す
         
-        image_data = None
+        Returns:
+            (ユーザーID, グループID)のタプル。ハンドシェイクでない場合やペイロードが不足している場合はNone
+        """
+        if self.payload_type != PayloadType.Handshake or self.payload_size < _HANDSHAKE_STRUCT.size:
+            return None
+        return _HANDSHAKE_STRUCT.unpack_from(self._payload)
+
+    def raw_image_bytes(self) -> Optional[Union[bytes, memoryview]]:
+        """
+        画像の PNG データを Base64 エンコードせずにそのまま取り出す
+        バイナリで送信し直す場合など、Base64 文字列が不要な場合に使用する
         
-        if self.payload_type == PayloadType.PngImage:
-            image_data = self.payload
-        elif self.payload_type == PayloadType.TextAndPngImage:
-            parts = PacketFrameHelper.byte_array_to_list(self.payload)
-            if len(parts) >= 2:
-                image_data = parts[1]
-        elif self.payload_type == PayloadType.Complex:
-            _, images, _, _ = self.to_complex()
-            if images:
-                buf = BytesIO()
-                images[0].save(buf, format='PNG')
-                image_data = buf.getvalue()
+        Returns:
+            PNG データ（ペイロードを参照する memoryview の場合がある）。画像を含まない場合はNone
+        """
+        return self._first_image_data()
+
+    def to_base64_image(self, with_header: bool = True) -> str:
+        """画像をBase64文字列として取り出す"""
+        image_data = self._first_image_data()
                 
         if image_data:
-            b64 = base64.b64encode(image_data).decode('ascii')
+            # memoryview のままエンコードし、ヘッダーはバイト列の段階で連結して1回だけ文字列に変換する
+            b64 = base64.b64encode(image_data)
             if with_header:
-                return f"data:image/png;base64,{b64}"
-            return b64
+                b64 = _BASE64_PNG_HEADER + b64
+            return b64.decode('ascii')
             
         return ""
 
     @staticmethod
     def convert_base64_string_to_image(base64_data: str, is_with_header: bool = True) -> Image.Image:
         """Base64文字列から画像を生成する"""
-        import base64
-        
         # ヘッダーを削除
         if is_with_header and ',' in base64_data:
             base64_data = base64_data.split(',', 1)[1]
@@ -5,18 +5,24 @@ from typing import Optional
 from .socket_interfaces import ClientBase
 from .packet_callbacks import PacketProcessor
 from .packet_frame import PacketFrame, debug_print
-from .tcp_protocol import TcpProtocol
+from .tcp_protocol import PacketStreamReader, TcpProtocol
 
 
 class TcpClient(ClientBase):
     """TCP通信を行うクライアントクラス"""
     
-    def __init__(self):
+    def __init__(self, packet_queue_size: int = 0):
+        """
+        Args:
+            packet_queue_size: 受信パケットキューのサイズ（PacketProcessor の queue_size）。
+                               0の場合はキューを使わず受信ループで同期的に処理する。
+                               キューを使う場合は DEFAULT_PACKET_QUEUE_SIZE を目安に指定する
+        """
         super().__init__()
         self._reader: Optional[asyncio.StreamReader] = None
         self._writer: Optional[asyncio.StreamWriter] = None
         self._receive_task: Optional[asyncio.Task] = None
-        self._processor = PacketProcessor(self)
+        self._processor = PacketProcessor(self, packet_queue_size)
         self._connected = False
         self._session_id = 0  # サーバーから割り当てられるセッションID
         
@@ -45,21 +51,18 @@ class TcpClient(ClientBase):
             # サーバーに接続
             self._reader, self._writer = await asyncio.open_connection(server_name, port_number)
             
+            # 小さいパケット（ハンドシェイクなど）を遅延なく送信するため Nagle アルゴリズムを無効化
+            sock = self._writer.get_extra_info('socket')
+            if sock is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            
             # クライアント情報を設定
             self._user_id = client_user_id
             self._group_id = client_group_id
             self._connected = True
             
-            # 接続完了後の待機（安定化のため）
-            await asyncio.sleep(0.5)
-            
             # 初期ハンドシェイクパケットの送信（サーバーに自分の情報を伝える）
-            handshake_packet = PacketFrame.from_text(
-                f"CONNECT:{client_user_id}:{client_group_id}",
-                destination_user_id=0,  # サーバー宛て
-                source_user_id=client_user_id,
-                source_group_id=client_group_id
-            )
+            handshake_packet = PacketFrame.from_handshake(client_user_id, client_group_id)
             await self._send_raw_packet(handshake_packet)
             
             # 受信タスクを開始
@@ -74,21 +77,23 @@ class TcpClient(ClientBase):
     async def _receive_loop(self) -> None:
         """サーバーからデータを受信し続けるループ"""
         try:
-            while self.is_alive and self._reader is not None:
-                # 完全なパケットを待機
-                packet = await TcpProtocol.receive_packet(self._reader)
-                if packet is None:
+            packet_reader = PacketStreamReader(self._reader)
+            while self.is_alive:
+                # 受信済みの完全なパケットをまとめて取り出す
+                packets = await packet_reader.read_packets()
+                if packets is None:
                     debug_print("パケットの読み込みに失敗しました")
                     break
                 
-                # セッションIDはクライアント側では特に処理不要
-                if packet.payload_type == 1:  # PlainText
-                    message = packet.payload.decode('utf-8', errors='ignore')
-                    if message.startswith("ようこそ！"):
-                        debug_print("サーバーからウェルカムメッセージを受信しました")
-                
-                # パケットを処理
-                self._processor.process_packet(packet, "Server")
+                for packet in packets:
+                    # セッションIDはクライアント側では特に処理不要
+                    if packet.payload_type == 1:  # PlainText
+                        message = str(packet.payload, 'utf-8', 'ignore')
+                        if message.startswith("ようこそ！"):
+                            debug_print("サーバーからウェルカムメッセージを受信しました")
+                    
+                    # パケットを処理
+                    await self._processor.process_packet_async(packet, "Server")
                     
         except asyncio.CancelledError:
             # タスクがキャンセルされた
@@ -107,11 +112,16 @@ class TcpClient(ClientBase):
         """
         生のパケットデータを送信する（内部メソッド）
         """
-        if not self.is_alive or self._writer is None:
+        if self._writer is None:
             raise ConnectionError("サーバーに接続されていません")
             
+        # 接続状態は呼び出し側で確認済みのため、ここでは確認せずに書き込み、失敗した場合に切断扱いにする
         try:
             await TcpProtocol.send_packet(self._writer, packet)
+        except (ConnectionResetError, BrokenPipeError, ConnectionAbortedError) as e:
+            self._connected = False
+            self.raise_log_message(f"データ送信中にエラーが発生: {e}")
+            raise
         except Exception as e:
             self.raise_log_message(f"データ送信中にエラーが発生: {e}")
             raise
@@ -148,6 +158,9 @@ class TcpClient(ClientBase):
         if self._receive_task is not None and not self._receive_task.done():
             self._receive_task.cancel()
             
+        # 受信パケットの処理タスクを停止
+        self._processor.close()
+            
         # 接続を閉じる
         if self._writer is not None and not self._writer.is_closing():
             self._writer.close()
@@ -1,11 +1,67 @@
 #Py.HagLib.Socket/Socket/tcp_protocol.py
 import asyncio
-import struct  # struct モジュールを追加
-from typing import Optional, Tuple
-from .packet_frame import PacketFrame, debug_print
+from typing import List, Optional, Tuple
+from . import packet_frame
+from .packet_frame import PacketFrame, _PT_BY_VALUE, _EMPTY, _decode_header, _scan_frames, debug_print
 from io import BytesIO
 
 
+# パケットヘッダーのコンパイル済み Struct（受信ごとのクラス属性の参照を省く）
+_HEADER = PacketFrame._HEADER_STRUCT
+_MAGIC_INT = PacketFrame._MAGIC_INT
+
+# このサイズ以下のペイロードはヘッダーと合わせて1つのバッファに直接書き込んで送信する
+# （これより大きいペイロードはコピーせずにヘッダーと別のバッファのまま送信する）
+_PACK_INTO_MAX_PAYLOAD = 64 * 1024
+
+# PacketStreamReader が1回に読み込む最大サイズ
+_READ_CHUNK_SIZE = 64 * 1024
+
+
+def _make_packet(destination_group_id: int, destination_user_id: int, source_group_id: int, source_user_id: int,
+                 payload_type: int, payload: bytes) -> PacketFrame:
+    """解析済みのヘッダーの値とペイロードから PacketFrame を構築する"""
+    return PacketFrame(
+        destination_group_id=destination_group_id,
+        destination_user_id=destination_user_id,
+        source_group_id=source_group_id,
+        source_user_id=source_user_id,
+        payload_type=_PT_BY_VALUE.get(payload_type, payload_type),  # 未定義のタイプは int のまま保持
+        payload=payload
+    )
+
+
+def _scan_frames_py(data: bytes) -> Optional[Tuple[List[tuple], int]]:
+    """
+    連続して受信したバイト列から、完全に受信できたパケットの位置をまとめて求める（_packet_frame.scan_frames の純 Python 版）
+    
+    Returns:
+        (フレームのリスト, 最初の未完成パケットの位置) のタプル。
+        各フレームは (送信先グループID, 送信先ユーザーID, 送信元グループID, 送信元ユーザーID, ペイロードタイプ,
+        ペイロード開始位置, ペイロード終了位置) のタプル。マジック値が一致しないヘッダーがある場合はNone
+    """
+    size = len(data)
+    header_size = PacketFrame.HEADER_SIZE
+    offset = 0
+    frames = []
+    while size - offset >= header_size:
+        packet_header = _HEADER.unpack_from(data, offset)
+        if packet_header[0] != _MAGIC_INT:
+            return None
+        start = offset + header_size
+        end = start + packet_header[7]
+        if end > size:
+            break
+        frames.append((packet_header[2], packet_header[3], packet_header[4], packet_header[5], packet_header[6],
+                       start, end))
+        offset = end
+    return frames, offset
+
+
+# フレーム位置の走査（Cython 版がビルドされている場合はそちらを使用）
+_scan = _scan_frames if _scan_frames is not None else _scan_frames_py
+
+
 class TcpProtocol:
     """TCP通信でのパケット送受信を扱うプロトコルクラス"""
 
@@ -18,16 +74,25 @@ class TcpProtocol:
             writer: 送信先のStreamWriter
             packet: 送信するPacketFrame
         """
-        if writer is None or writer.is_closing():
+        if writer is None:
             raise ConnectionError("送信先が閉じられています")
         
         try:
-            # パケットをバイト列に変換
-            data = packet.to_bytes()
-            debug_print(f"送信パケット: サイズ={len(data)}, ヘッダー={data[:PacketFrame.HEADER_SIZE].hex()}")
-            
-            # データを送信
-            writer.write(data)
+            payload_size = packet.payload_size
+            if payload_size <= _PACK_INTO_MAX_PAYLOAD:
+                # 小さいパケットはヘッダーの bytes を作らず、送信用バッファに直接シリアライズする
+                # （トランスポートが渡したバッファを保持する場合があるため、バッファは送信ごとに確保する）
+                buf = bytearray(PacketFrame.HEADER_SIZE + payload_size)
+                packet.pack_into(buf, 0)
+                if packet_frame.DEBUG:
+                    debug_print(f"送信パケット: サイズ={len(buf)}, ヘッダー={buf[:PacketFrame.HEADER_SIZE].hex()}")
+                writer.write(buf)
+            else:
+                # 大きいパケットはヘッダーとペイロードに分けて変換（連結のコピーは行わない）
+                header, payload = packet.to_iovec()
+                if packet_frame.DEBUG:
+                    debug_print(f"送信パケット: サイズ={len(header) + len(payload)}, ヘッダー={header.hex()}")
+                writer.writelines((header, payload))
             await writer.drain()
             
         except Exception as e:
@@ -53,36 +118,39 @@ class TcpProtocol:
                 debug_print("接続が閉じられました")
                 return None
                 
-            debug_print(f"受信ヘッダー: {header_data.hex()}")
+            if packet_frame.DEBUG:
+                debug_print(f"受信ヘッダー: {header_data.hex()}")
             
-            # ヘッダーから必要なペイロードサイズを取得
-            packet_header = struct.unpack(PacketFrame.HEADER_FORMAT, header_data)
-            if packet_header[0] != PacketFrame.HEADER_MAGIC:
-                debug_print(f"無効なマジック値: {packet_header[0]} != {PacketFrame.HEADER_MAGIC}")
+            # ヘッダーを解析（Cython 版がビルドされている場合はそちらを使用）
+            if _decode_header is not None:
+                fields = _decode_header(header_data)
+            else:
+                packet_header = _HEADER.unpack_from(header_data)
+                fields = packet_header[2:] if packet_header[0] == _MAGIC_INT else None
+            if fields is None:
+                debug_print(f"無効なマジック値: {header_data[:4]} != {PacketFrame.HEADER_MAGIC}")
                 return None
                 
-            payload_size = packet_header[7]  # ヘッダーの8番目の要素がペイロードサイズ
-            debug_print(f"ペイロードサイズ: {payload_size}")
+            destination_group_id, destination_user_id, source_group_id, source_user_id, payload_type, payload_size = fields
+            if packet_frame.DEBUG:
+                debug_print(f"ペイロードサイズ: {payload_size}")
             
             # ペイロードを読み込む
-            payload_data = b''
+            payload_data = _EMPTY
             if payload_size > 0:
                 try:
                     payload_data = await reader.readexactly(payload_size)
-                    debug_print(f"ペイロード読み込み完了: {len(payload_data)}/{payload_size}")
+                    if packet_frame.DEBUG:
+                        debug_print(f"ペイロード読み込み完了: {len(payload_data)}/{payload_size}")
                 except asyncio.IncompleteReadError as e:
                     debug_print(f"ペイロード読み込み不完全: {len(e.partial)}/{payload_size}")
                     return None
                     
-            # 完全なパケットデータを構築
-            packet_data = header_data + payload_data
-            
-            # パケットを解析
-            packet = PacketFrame.from_bytes(packet_data)
-            if packet:
+            # ヘッダーは解析済みのため、ヘッダーとペイロードを連結せずにパケットを構築する
+            packet = _make_packet(destination_group_id, destination_user_id, source_group_id, source_user_id,
+                                  payload_type, payload_data)
+            if packet_frame.DEBUG:
                 debug_print(f"パケット受信完了: ペイロードサイズ={packet.payload_size}")
-            else:
-                debug_print("パケットの解析に失敗しました")
                 
             return packet
             
@@ -94,4 +162,86 @@ class TcpProtocol:
             return None
         except Exception as e:
             debug_print(f"パケット受信エラー: {e}")
-            return None
\ No newline at end of file
+            return None
+
+
+class PacketStreamReader:
+    """
+    StreamReader からまとめて読み込み、バッファ内の完全なパケットをすべて取り出すクラス
+    
+    パケットごとに readexactly を2回呼び出す TcpProtocol.receive_packet と異なり、
+    連続して届いたパケットを1回の読み込みでまとめて処理する。
+    """
+    __slots__ = ('_reader', '_pending')
+    
+    def __init__(self, reader: asyncio.StreamReader):
+        """
+        Args:
+            reader: 受信元のStreamReader
+        """
+        self._reader = reader
+        self._pending: Optional[bytes] = _EMPTY  # 前回の読み込みで残った未完成のパケットのデータ（接続終了後はNone）
+    
+    async def read_packets(self) -> Optional[List[PacketFrame]]:
+        """
+        データを読み込み、完全に受信できたパケットをすべて返す
+        
+        Returns:
+            受信したPacketFrameのリスト（完全なパケットがまだない場合は空のリスト）。
+            接続が閉じられた場合や不正なデータを受信した場合はNone
+        """
+        reader = self._reader
+        if self._pending is None:
+            return None  # 前回の呼び出しで接続の終了を検出済み
+        try:
+            chunk = await reader.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                debug_print("接続が閉じられました")
+                return None
+            
+            data = self._pending + chunk if self._pending else chunk
+            size = len(data)
+            
+            # 完全に受信できたパケットの位置をまとめて求める
+            scanned = _scan(data)
+            if scanned is None:
+                debug_print(f"無効なマジック値を受信しました（期待値: {PacketFrame.HEADER_MAGIC}）")
+                return None
+            frames, offset = scanned
+            packets: List[PacketFrame] = [
+                _make_packet(destination_group_id, destination_user_id, source_group_id, source_user_id, payload_type,
+                             data[start:end] if end > start else _EMPTY)
+                for destination_group_id, destination_user_id, source_group_id, source_user_id, payload_type, start, end
+                in frames
+            ]
+            
+            # 未完成のパケットのうち大きいペイロードは、残りを直接読み込む（バッファへの連結を繰り返さない）
+            if size - offset >= PacketFrame.HEADER_SIZE:
+                packet_header = _HEADER.unpack_from(data, offset)
+                payload_size = packet_header[7]
+                if payload_size > _READ_CHUNK_SIZE:
+                    start = offset + PacketFrame.HEADER_SIZE
+                    try:
+                        rest = await reader.readexactly(start + payload_size - size)
+                    except asyncio.IncompleteReadError:
+                        # 同じ読み込みで受信済みの完全なパケットは返し、接続の終了は次の呼び出しで通知する
+                        debug_print("接続が切断されました（IncompleteReadError）")
+                        self._pending = None
+                        return packets
+                    payload = data[start:] + rest
+                    packets.append(_make_packet(packet_header[2], packet_header[3], packet_header[4], packet_header[5],
+                                                packet_header[6], payload))
+                    offset = size
+            
+            self._pending = data[offset:] if offset < size else _EMPTY
+            return packets
+            
+        except asyncio.CancelledError:
+            debug_print("受信タスクがキャンセルされました")
+            return None
+        except asyncio.IncompleteReadError:
+            debug_print("接続が切断されました（IncompleteReadError）")
+            return None
+        except Exception as e:
+            debug_print(f"パケット受信エラー: {e}")
+            return None
@@ -1,17 +1,94 @@
 #Py.HagLib.Socket/Socket/tcp_server.py
 import asyncio
+import os
 import socket
-from typing import Dict, Optional, Set, List
+from typing import Callable, Dict, Iterable, Optional, Set, List, Tuple, Union
 from .socket_interfaces import IClientSession, ServerBase
 from .packet_callbacks import PacketProcessor
-from .packet_frame import PacketFrame, debug_print
-from .tcp_protocol import TcpProtocol
+from . import packet_frame
+from .packet_frame import PacketFrame, PayloadType, debug_print
+from .tcp_protocol import PacketStreamReader
+
+
+# セッションごとの送信キューのサイズ（パケット数）。満杯の場合は送信側が空きを待つ
+SEND_QUEUE_SIZE = 1024
+
+# 複数のクライアントへの送信で、送信キューの空きを待つ最大時間（秒）。超えたセッションは切断する
+SEND_BLOCK_TIMEOUT = 5.0
+
+# 送信キューからまとめて書き込む上限（パケット数・バイト数）
+_SEND_BATCH_MAX_PACKETS = 64
+_SEND_BATCH_MAX_BYTES = 256 * 1024
+
+# トランスポートの書き込みバッファの上限・下限。下限を超えて溜まっている場合のみ drain で待機する
+SEND_BUFFER_HIGH_WATERMARK = 256 * 1024
+SEND_BUFFER_LOW_WATERMARK = 64 * 1024
+
+# 接続ごとのソケット送信バッファサイズ（SO_SNDBUF）。None の場合は OS の自動調整に任せる
+# （Linux では明示的に設定すると自動調整が無効になるため、既定では設定しない）
+SOCKET_SEND_BUFFER_SIZE: Optional[int] = None
+
+
+def _skip_sent(chunks: List[Union[bytes, memoryview]], sent: int) -> List[Union[bytes, memoryview]]:
+    """
+    送信済みのバイト数を除いた残りのバッファのリストを返す
+    
+    Args:
+        chunks: 送信したバッファのリスト
+        sent: 送信できたバイト数
+    """
+    for i, chunk in enumerate(chunks):
+        size = len(chunk)
+        if sent < size:
+            rest = chunks[i + 1:]
+            rest.insert(0, memoryview(chunk)[sent:] if sent else chunk)
+            return rest
+        sent -= size
+    return []
+
+
+def _queued_frame(packet: PacketFrame) -> Tuple[bytes, bytes]:
+    """
+    送信キューに積むフレーム（ヘッダー, ペイロード）を作成する
+    
+    キューのフレームは送信タスクが後から書き込むため、bytes 以外のペイロード（bytearray など）は
+    呼び出し元が再利用しても影響を受けないようにこの時点でコピーしておく（複数のセッションで共有するため1回だけ）
+    """
+    header, payload = packet.to_iovec()
+    if type(payload) is not bytes:
+        payload = bytes(payload)
+    return header, payload
+
+
+class _SessionStreamProtocol(asyncio.StreamReaderProtocol):
+    """接続が失われたことを TcpClientSession に通知する StreamReaderProtocol"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session: Optional['TcpClientSession'] = None
+        self.lost = False
+        
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.lost = True
+        if self.session is not None:
+            self.session._mark_lost()
+        super().connection_lost(exc)
 
 
 class TcpClientSession(IClientSession):
     """TCP接続のクライアントセッションを表すクラス"""
     
-    def __init__(self, writer: asyncio.StreamWriter, session_id: int, user_id: int = 0, group_id: int = 0, name: str = None):
+    def __init__(self, writer: asyncio.StreamWriter, session_id: int, user_id: int = 0, group_id: int = 0, name: str = None,
+                 on_send_error: Optional[Callable[['TcpClientSession', Exception], None]] = None):
+        """
+        Args:
+            writer: クライアントへの書き込みストリーム
+            session_id: セッションID
+            user_id: ユーザーID
+            group_id: グループID
+            name: セッション名
+            on_send_error: 送信タスクで書き込みエラーが発生したときに呼ばれるコールバック
+        """
         self._writer = writer
         self._session_id = session_id  # セッションID（接続ごとに一意）
         self._user_id = user_id        # ユーザーID（同一ユーザーから複数接続可能）
@@ -19,6 +96,41 @@ class TcpClientSession(IClientSession):
         self._name = name
         self._is_alive = True
         
+        # 接続が失われたかどうか（_SessionStreamProtocol.connection_lost で更新され、
+        # is_alive のたびにトランスポートへ問い合わせずに済む）
+        self._closed = False
+        # セッションが閉じられたことを、送信キューの空きを待っている送信側に通知するイベント
+        self._closed_event = asyncio.Event()
+        protocol = writer.transport.get_protocol()
+        if isinstance(protocol, _SessionStreamProtocol):
+            protocol.session = self
+            if protocol.lost:
+                self._mark_lost()
+        self._peer = writer.get_extra_info('peername')  # 接続元アドレス（ログ出力用に作成時に取得しておく）
+        
+        # ソケットの設定（小さいパケットを遅延なく送信し、無応答の接続を検出する）
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                if SOCKET_SEND_BUFFER_SIZE:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_SEND_BUFFER_SIZE)
+            except OSError as e:
+                debug_print(f"ソケットオプションの設定に失敗しました: {e}")
+        
+        # 送信キューのパケットを直接書き込むソケットのファイル記述子（os.writev が使えない場合や TLS の場合は -1）
+        if sock is not None and hasattr(os, 'writev') and writer.get_extra_info('sslcontext') is None:
+            self._fd = sock.fileno()
+        else:
+            self._fd = -1
+        
+        # 送信キューと、キューから取り出してまとめて書き込む送信タスク
+        self._send_queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self._send_task: Optional[asyncio.Task] = None
+        self._on_send_error = on_send_error
+        writer.transport.set_write_buffer_limits(high=SEND_BUFFER_HIGH_WATERMARK, low=SEND_BUFFER_LOW_WATERMARK)
+        
     @property
     def group_id(self) -> int:
         return self._group_id
@@ -45,17 +157,168 @@ class TcpClientSession(IClientSession):
         
     @property
     def is_alive(self) -> bool:
-        return self._is_alive and not self._writer.is_closing()
+        return self._is_alive and not self._closed
     
     @property
     def session_id(self) -> int:
         return self._session_id
+    
+    @property
+    def peer(self):
+        """接続元アドレス（peername）"""
+        return self._peer
+        
+    def _mark_lost(self) -> None:
+        """接続が失われたことを記録する（_SessionStreamProtocol.connection_lost から呼ばれる）"""
+        self._closed = True
+        self._closed_event.set()
         
     def close(self) -> None:
         """セッションを閉じる"""
         self._is_alive = False
+        self._closed_event.set()
+        if self._send_task is not None and not self._send_task.done():
+            self._send_task.cancel()
         if not self._writer.is_closing():
             self._writer.close()
+    
+    def abort(self) -> None:
+        """送信待ちのデータを破棄し、セッションを直ちに閉じる（受信を停止しているクライアント向け）"""
+        self.close()
+        self._writer.transport.abort()
+    
+    def start_sending(self) -> None:
+        """送信タスクを開始する（イベントループ上で呼び出すこと）"""
+        if self._send_task is None:
+            self._send_task = asyncio.get_running_loop().create_task(self._send_loop())
+    
+    def enqueue_packet(self, packet: PacketFrame) -> bool:
+        """
+        パケットを送信キューに積む（待機しない）
+        
+        Args:
+            packet: 送信するパケット
+        
+        Returns:
+            キューに積んだ場合はTrue、キューが満杯の場合はFalse
+        """
+        return self.enqueue_frame(_queued_frame(packet))
+    
+    def enqueue_frame(self, frame: Tuple[bytes, bytes]) -> bool:
+        """
+        シリアライズ済みのパケットを送信キューに積む（待機しない）
+        
+        Args:
+            frame: _queued_frame() の戻り値。複数のセッションで同じものを共有してよい
+        
+        Returns:
+            キューに積んだ場合はTrue、キューが満杯の場合はFalse
+        """
+        try:
+            self._send_queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        return True
+    
+    async def send_packet(self, packet: PacketFrame) -> bool:
+        """
+        パケットを送信キューに積む。キューが満杯の場合は空きができるまで待機する
+        
+        Args:
+            packet: 送信するパケット
+        
+        Returns:
+            キューに積んだ場合はTrue、セッションが閉じられたため破棄した場合はFalse
+        """
+        return await self.send_frame(_queued_frame(packet))
+    
+    async def send_frame(self, frame: Tuple[bytes, bytes]) -> bool:
+        """
+        シリアライズ済みのパケットを送信キューに積む。キューが満杯の場合は空きができるまで待機する
+        
+        待機中にセッションが閉じられた場合（送信タスクが停止し、キューが空かなくなる）は待機を終了し、パケットを破棄する。
+        
+        Args:
+            frame: _queued_frame() の戻り値
+        
+        Returns:
+            キューに積んだ場合はTrue、セッションが閉じられたため破棄した場合はFalse
+        """
+        if self.enqueue_frame(frame):
+            return True
+        if not self.is_alive:
+            return False
+        
+        put_task = asyncio.ensure_future(self._send_queue.put(frame))
+        closed_task = asyncio.ensure_future(self._closed_event.wait())
+        try:
+            await asyncio.wait((put_task, closed_task), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            closed_task.cancel()
+            if not put_task.done():
+                put_task.cancel()
+        
+        if not put_task.done() or put_task.cancelled() or not self.is_alive:
+            debug_print(f"セッション {self._session_id} は閉じられたため、パケットを破棄しました")
+            return False
+        return True
+    
+    async def _send_loop(self) -> None:
+        """送信キューからパケットを取り出し、複数パケットをまとめて書き込む"""
+        queue = self._send_queue
+        writer = self._writer
+        transport = writer.transport
+        try:
+            while True:
+                chunks: List[Union[bytes, memoryview]] = list(await queue.get())
+                size = len(chunks[0]) + len(chunks[1])
+                count = 1
+                
+                # すでにキューにあるパケットを上限までまとめる
+                while count < _SEND_BATCH_MAX_PACKETS and size < _SEND_BATCH_MAX_BYTES and not queue.empty():
+                    header, payload = queue.get_nowait()
+                    chunks.append(header)
+                    chunks.append(payload)
+                    size += len(header) + len(payload)
+                    count += 1
+                
+                self._write_chunks(transport, chunks)
+                # カーネルの送信バッファに書き込めている間は待機せず、未送信データが溜まった場合のみ drain する
+                if transport.get_write_buffer_size() > SEND_BUFFER_LOW_WATERMARK:
+                    await writer.drain()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # 書き込みに失敗したセッションは接続を閉じる（connection_lost により受信ループが終了し、終了処理を行う）
+            self._is_alive = False
+            self._closed_event.set()
+            if not self._writer.is_closing():
+                self._writer.close()
+            if self._on_send_error is not None:
+                self._on_send_error(self, e)
+            
+    def _write_chunks(self, transport: asyncio.WriteTransport, chunks: List[Union[bytes, memoryview]]) -> None:
+        """
+        まとめたパケットを書き込む
+        
+        トランスポートに未送信データがない場合は os.writev でソケットに直接書き込み、
+        ヘッダーとペイロードを連結・コピーせずにカーネルへ渡す。書き込みきれなかった残りのみトランスポートに渡す
+        （トランスポートに未送信データがある場合は順序を保つため、すべてトランスポートに渡す）。
+        
+        Args:
+            transport: 書き込み先のトランスポート
+            chunks: ヘッダーとペイロードを交互に並べたバッファのリスト
+        """
+        if self._fd >= 0 and not transport.is_closing() and transport.get_write_buffer_size() == 0:
+            try:
+                sent = os.writev(self._fd, chunks)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            if sent:
+                chunks = _skip_sent(chunks, sent)
+                if not chunks:
+                    return
+        self._writer.writelines(chunks)
             
     def get_writer(self) -> asyncio.StreamWriter:
         """StreamWriterを取得する"""
@@ -65,37 +328,57 @@ class TcpClientSession(IClientSession):
 class TcpServer(ServerBase):
     """TCP通信を行うサーバークラス"""
     
-    def __init__(self):
+    def __init__(self, packet_queue_size: int = 0):
+        """
+        Args:
+            packet_queue_size: 受信パケットキューのサイズ（PacketProcessor の queue_size）。
+                               0の場合はキューを使わず受信ループで同期的に処理する。
+                               キューを使う場合は DEFAULT_PACKET_QUEUE_SIZE を目安に指定する
+        """
         super().__init__()
-        self._sessions: Dict[int, TcpClientSession] = {}  # session_id -> TcpClientSession
-        self._user_sessions: Dict[int, List[int]] = {}    # user_id -> List[session_id]
+        # session_id -> TcpClientSession（コピーオンライト: 変更時は新しい辞書に差し替え、既存の辞書は変更しない）
+        self._sessions: Dict[int, TcpClientSession] = {}
+        self._user_sessions: Dict[int, Set[int]] = {}     # user_id -> Set[session_id]
+        self._group_sessions: Dict[int, Set[int]] = {}    # group_id -> Set[session_id]
+        self._user_group_sessions: Dict[Tuple[int, int], Set[int]] = {}  # (user_id, group_id) -> Set[session_id]
         self._server = None
         self._next_session_id = 1  # 新しいクライアントに割り当てるセッションID
         self._running = False
-        self._processor = PacketProcessor(self)
-        self._sessions_lock = asyncio.Lock()  # セッション管理用のロック
+        self._processor = PacketProcessor(self, packet_queue_size)
+        self._sessions_lock = asyncio.Lock()  # セッションとインデックスの複合的な更新用のロック
         
     @property
     def sessions(self) -> Dict[int, IClientSession]:
         return self._sessions
         
-    async def start_async(self, port_number: int) -> None:
+    async def start_async(self, port_number: int, backlog: int = 100, reuse_port: bool = False) -> None:
         """
         サーバーを開始する
         
         Args:
             port_number: リッスンするポート番号
+            backlog: 接続待ちキューの長さ（同時に多数の接続を受け付ける場合は大きくする）
+            reuse_port: Trueの場合 SO_REUSEPORT を設定し、複数のプロセスで同じポートをリッスンできるようにする
+                        （カーネルが接続をプロセス間で振り分ける。セッションはプロセスごとに管理されるため、
+                        別のプロセスに接続したクライアントへはパケットは転送されない）
         """
         if self._running:
             return
             
         self._running = True
         
-        # サーバーの起動
-        self._server = await asyncio.start_server(
-            self._handle_client,
+        # サーバーの起動（asyncio.start_server と同じ構成で、切断を検知するプロトコルを使用する）
+        loop = asyncio.get_running_loop()
+        
+        def protocol_factory() -> _SessionStreamProtocol:
+            return _SessionStreamProtocol(asyncio.StreamReader(loop=loop), self._handle_client, loop=loop)
+        
+        self._server = await loop.create_server(
+            protocol_factory,
             '0.0.0.0',  # すべてのインターフェースでリッスン
-            port_number
+            port_number,
+            backlog=backlog,
+            reuse_port=reuse_port or None
         )
         
         addr = self._server.sockets[0].getsockname()
@@ -105,33 +388,79 @@ class TcpServer(ServerBase):
         async with self._server:
             await self._server.serve_forever()
     
-    async def _register_user_session(self, session_id: int, user_id: int) -> None:
-        """ユーザーとセッションの関連付けを登録する"""
+    def _add_session(self, session: TcpClientSession) -> None:
+        """セッションを追加した新しい辞書に差し替える"""
+        sessions = dict(self._sessions)
+        sessions[session.session_id] = session
+        self._sessions = sessions
+    
+    def _remove_session(self, session_id: int) -> None:
+        """セッションを削除した新しい辞書に差し替える"""
+        if session_id in self._sessions:
+            sessions = dict(self._sessions)
+            del sessions[session_id]
+            self._sessions = sessions
+    
+    async def _register_user_session(self, session_id: int, user_id: int, group_id: int) -> None:
+        """
+        ユーザー・グループとセッションの関連付けを登録する
+        
+        Args:
+            session_id: セッションID
+            user_id: ユーザーID（0の場合はグループへの関連付けのみ行う）
+            group_id: グループID
+        """
         async with self._sessions_lock:
-            if user_id not in self._user_sessions:
-                self._user_sessions[user_id] = []
+            self._group_sessions.setdefault(group_id, set()).add(session_id)
+            if user_id == 0:
+                return
             
-            if session_id not in self._user_sessions[user_id]:
-                self._user_sessions[user_id].append(session_id)
-                debug_print(f"ユーザー {user_id} にセッション {session_id} を関連付けました")
+            self._user_sessions.setdefault(user_id, set()).add(session_id)
+            debug_print(f"ユーザー {user_id} にセッション {session_id} を関連付けました")
+            self._user_group_sessions.setdefault((user_id, group_id), set()).add(session_id)
             
-    async def _unregister_user_session(self, session_id: int, user_id: int) -> None:
-        """ユーザーとセッションの関連付けを解除する"""
+    async def _unregister_user_session(self, session_id: int, user_id: int, group_id: int) -> None:
+        """
+        ユーザー・グループとセッションの関連付けを解除する
+        
+        Args:
+            session_id: セッションID
+            user_id: ユーザーID（0の場合はグループの関連付けのみ解除する）
+            group_id: グループID
+        """
         async with self._sessions_lock:
+            self._discard_index(self._group_sessions, group_id, session_id)
+            if user_id == 0:
+                return
+            
+            self._discard_index(self._user_group_sessions, (user_id, group_id), session_id)
             if user_id in self._user_sessions and session_id in self._user_sessions[user_id]:
-                self._user_sessions[user_id].remove(session_id)
                 debug_print(f"ユーザー {user_id} からセッション {session_id} の関連付けを解除しました")
-                
-                # リストが空になったら辞書から削除
-                if not self._user_sessions[user_id]:
-                    del self._user_sessions[user_id]
+                if self._discard_index(self._user_sessions, user_id, session_id):
                     debug_print(f"ユーザー {user_id} のセッションリストが空になったため削除しました")
                 else:
                     debug_print(f"ユーザー {user_id} にはまだ {len(self._user_sessions[user_id])} 個のセッションが残っています")
+    
+    @staticmethod
+    def _discard_index(index: Dict, key, session_id: int) -> bool:
+        """
+        インデックスからセッションIDを取り除き、空になったキーは辞書から削除する
+        
+        Returns:
+            キーを削除した場合はTrue
+        """
+        session_ids = index.get(key)
+        if session_ids is None:
+            return False
+        session_ids.discard(session_id)
+        if session_ids:
+            return False
+        del index[key]
+        return True
                 
-    def _get_user_sessions(self, user_id: int) -> List[int]:
-        """ユーザーIDに関連付けられたすべてのセッションIDのリストを取得する"""
-        return self._user_sessions.get(user_id, []).copy()  # コピーを返すことで安全性を向上
+    def _get_user_sessions(self, user_id: int) -> Tuple[int, ...]:
+        """ユーザーIDに関連付けられたすべてのセッションIDのタプルを取得する"""
+        return tuple(self._user_sessions.get(user_id, ()))  # スナップショットを返すことで安全性を向上
             
     async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
         """
@@ -141,16 +470,17 @@ class TcpServer(ServerBase):
             reader: クライアントからの読み込みストリーム
             writer: クライアントへの書き込みストリーム
         """
-        # クライアントのアドレス情報を取得
-        addr = writer.get_extra_info('peername')
         session_id = self._next_session_id
         self._next_session_id += 1
         
         # 初期値ではグループIDとユーザーIDは0とする
-        session = TcpClientSession(writer, session_id, 0, 0, f"Client-{session_id}")
+        session = TcpClientSession(writer, session_id, 0, 0, f"Client-{session_id}", self._on_session_send_error)
         
-        async with self._sessions_lock:
-            self._sessions[session_id] = session
+        # クライアントのアドレス情報を取得
+        addr = session.peer
+        
+        self._add_session(session)
+        await self._register_user_session(session_id, 0, 0)
         
         self.raise_log_message(f"クライアント接続: {addr}, SessionID: {session_id}")
         
@@ -161,74 +491,23 @@ class TcpServer(ServerBase):
                 destination_user_id=0,  # まだユーザーIDが不明なのでセッションIDで宛先指定しない
                 source_user_id=0        # サーバーからのメッセージ
             )
-            await TcpProtocol.send_packet(writer, welcome_packet)
+            # 送信タスクを開始し、ウェルカムメッセージも送信キューに積む（drain を待たずに受信処理へ進む）
+            session.start_sending()
+            session.enqueue_packet(welcome_packet)
             
             # クライアントからのデータを処理
-            while session.is_alive:
-                # 完全なパケットを待機
-                packet = await TcpProtocol.receive_packet(reader)
-                if packet is None:
+            # ループ内で毎回属性を参照しないよう、メソッドをローカル変数に保持する
+            read_packets = PacketStreamReader(reader).read_packets
+            handle_packet = self._handle_packet
+            while True:
+                # 受信済みの完全なパケットをまとめて取り出す
+                # （接続が閉じられると connection_lost により EOF となり None が返るため、接続状態は確認しない）
+                packets = await read_packets()
+                if packets is None:
                     break
                 
-                # 接続要求メッセージの処理（CONNECT:user_id:group_id形式）
-                if packet.payload_type == 1:  # PlainText
-                    message = packet.payload.decode('utf-8', errors='ignore')
-                    if message.startswith("CONNECT:"):
-                        try:
-                            # メッセージからユーザーIDとグループIDを抽出
-                            parts = message.split(":")
-                            if len(parts) >= 3:
-                                user_id = int(parts[1])
-                                group_id = int(parts[2])
-                                
-                                # 旧ユーザーIDの関連付けを解除
-                                if session.user_id != 0:
-                                    await self._unregister_user_session(session_id, session.user_id)
-                                
-                                # 新しいユーザーID・グループIDを設定
-                                session.user_id = user_id
-                                session.group_id = group_id
-                                
-                                # ユーザーIDとセッションIDの関連付けを登録
-                                await self._register_user_session(session_id, user_id)
-                                
-                                debug_print(f"クライアント情報更新 - SessionID: {session_id}, UserID: {user_id}, GroupID: {group_id}")
-                        except (IndexError, ValueError) as e:
-                            debug_print(f"CONNECT メッセージ解析エラー: {e}")
-                
-                # パケットの送信元情報を更新（現在のセッション情報を使用）
-                if packet.source_user_id == 0xFFFF or packet.source_user_id == 0:
-                    packet.source_user_id = session.user_id
-                if packet.source_group_id == 0:
-                    packet.source_group_id = session.group_id
-                
-                # 宛先に応じた処理
-                if packet.destination_user_id == 0:
-                    # サーバー宛てのパケット処理
-                    debug_print(f"サーバー宛てパケット処理")
-                    self._processor.process_packet(packet, f"Server-Session{session_id}")
-                elif packet.destination_user_id == 0xFFFF:
-                    # ブロードキャストまたはグループ指定
-                    if packet.destination_group_id == 0xFFFF:
-                        # ブロードキャスト
-                        debug_print(f"ブロードキャスト転送")
-                        await self._send_to_all_clients_except(session_id, packet)
-                    else:
-                        # グループ指定
-                        debug_print(f"グループ {packet.destination_group_id} への転送")
-                        await self._send_to_group(packet.destination_group_id, packet)
-                    self.raise_log_message(f"[server from user {session.user_id}] 転送")
-                else:
-                    # 特定ユーザー指定
-                    if packet.destination_group_id == 0xFFFF:
-                        # ユーザーIDのみ指定
-                        debug_print(f"ユーザーID {packet.destination_user_id} への転送")
-                        await self._send_to_user(packet.destination_user_id, packet)
-                    else:
-                        # ユーザーIDとグループID両方指定
-                        debug_print(f"ユーザーID {packet.destination_user_id}, グループID {packet.destination_group_id} への転送")
-                        await self._send_to_user_and_group(packet.destination_user_id, packet.destination_group_id, packet)
-                    self.raise_log_message(f"[server from user {session.user_id}] 転送")
+                for packet in packets:
+                    await handle_packet(session, packet)
                 
         except asyncio.CancelledError:
             # タスクがキャンセルされた
@@ -241,9 +520,8 @@ class TcpServer(ServerBase):
             import traceback
             traceback.print_exc()
         finally:
-            # ユーザーとセッションの関連付けを解除
-            if session.user_id != 0:
-                await self._unregister_user_session(session_id, session.user_id)
+            # ユーザー・グループとセッションの関連付けを解除
+            await self._unregister_user_session(session_id, session.user_id, session.group_id)
             
             # クライアントとの接続を閉じる
             session.close()
@@ -254,78 +532,198 @@ class TcpServer(ServerBase):
                 pass
             
             # セッションを削除
-            async with self._sessions_lock:
-                if session_id in self._sessions:
-                    del self._sessions[session_id]
+            self._remove_session(session_id)
                 
             self.raise_log_message(f"クライアント切断: {addr}, SessionID: {session_id}")
     
+    async def _handle_packet(self, session: TcpClientSession, packet: PacketFrame) -> None:
+        """
+        クライアントから受信したパケットを処理する
+        
+        Args:
+            session: 受信したセッション
+            packet: 受信したパケット
+        """
+        # ハンドシェイクの処理（ユーザーID・グループIDのバイナリ形式）。サーバー内で完結するため転送しない
+        if packet.payload_type == PayloadType.Handshake:
+            ids = packet.to_handshake()
+            if ids is None:
+                debug_print("ハンドシェイクのペイロードが不足しています")
+            else:
+                await self._update_session_ids(session, ids[0], ids[1])
+            return
+        
+        # 接続要求メッセージの処理（CONNECT:user_id:group_id形式、旧クライアントとの互換用）
+        if packet.payload_type == 1:  # PlainText
+            message = str(packet.payload, 'utf-8', 'ignore')
+            if message.startswith("CONNECT:"):
+                try:
+                    # メッセージからユーザーIDとグループIDを抽出
+                    parts = message.split(":")
+                    if len(parts) >= 3:
+                        await self._update_session_ids(session, int(parts[1]), int(parts[2]))
+                except (IndexError, ValueError) as e:
+                    debug_print(f"CONNECT メッセージ解析エラー: {e}")
+        
+        # パケットの送信元情報を更新（現在のセッション情報を使用）
+        if packet.source_user_id == 0xFFFF or packet.source_user_id == 0:
+            packet.source_user_id = session.user_id
+        if packet.source_group_id == 0:
+            packet.source_group_id = session.group_id
+        
+        # 宛先に応じた処理
+        destination_user_id = packet.destination_user_id
+        destination_group_id = packet.destination_group_id
+        if destination_user_id == 0:
+            # サーバー宛てのパケット処理
+            if packet_frame.DEBUG:
+                debug_print("サーバー宛てパケット処理")
+            await self._processor.process_packet_async(packet, f"Server-Session{session.session_id}")
+        elif destination_user_id == 0xFFFF:
+            # ブロードキャストまたはグループ指定
+            if destination_group_id == 0xFFFF:
+                # ブロードキャスト
+                if packet_frame.DEBUG:
+                    debug_print("ブロードキャスト転送")
+                await self._send_to_all_clients_except(session.session_id, packet)
+            else:
+                # グループ指定
+                if packet_frame.DEBUG:
+                    debug_print(f"グループ {destination_group_id} への転送")
+                await self._send_to_group(destination_group_id, packet)
+            if self._log_message_handlers_t:  # リスナーがない場合はメッセージを組み立てない
+                self.raise_log_message(f"[server from user {session.user_id}] 転送")
+        else:
+            # 特定ユーザー指定
+            if destination_group_id == 0xFFFF:
+                # ユーザーIDのみ指定
+                if packet_frame.DEBUG:
+                    debug_print(f"ユーザーID {destination_user_id} への転送")
+                await self._send_to_user(destination_user_id, packet)
+            else:
+                # ユーザーIDとグループID両方指定
+                if packet_frame.DEBUG:
+                    debug_print(f"ユーザーID {destination_user_id}, グループID {destination_group_id} への転送")
+                await self._send_to_user_and_group(destination_user_id, destination_group_id, packet)
+            if self._log_message_handlers_t:  # リスナーがない場合はメッセージを組み立てない
+                self.raise_log_message(f"[server from user {session.user_id}] 転送")
+    
+    async def _update_session_ids(self, session: TcpClientSession, user_id: int, group_id: int) -> None:
+        """
+        セッションのユーザーID・グループIDを更新し、関連付けを登録し直す
+        
+        Args:
+            session: 対象のセッション
+            user_id: 新しいユーザーID
+            group_id: 新しいグループID
+        """
+        # 変わらない場合はインデックスを更新しない
+        if session.user_id == user_id and session.group_id == group_id:
+            return
+        
+        session_id = session.session_id
+        
+        # 旧ユーザーID・グループIDの関連付けを解除
+        await self._unregister_user_session(session_id, session.user_id, session.group_id)
+        
+        # 新しいユーザーID・グループIDを設定
+        session.user_id = user_id
+        session.group_id = group_id
+        
+        # ユーザーID・グループIDとセッションIDの関連付けを登録
+        await self._register_user_session(session_id, user_id, group_id)
+        
+        debug_print(f"クライアント情報更新 - SessionID: {session_id}, UserID: {user_id}, GroupID: {group_id}")
+    
     async def _send_to_all_clients_except(self, exclude_session_id: int, packet: PacketFrame) -> None:
         """指定したセッションID以外のすべてのクライアントにパケットを送信"""
-        sessions_copy = []
-        async with self._sessions_lock:
-            sessions_copy = list(self._sessions.items())
-            
-        for session_id, session in sessions_copy:
-            if session_id != exclude_session_id:
-                await self._send_packet_to_client(session, packet)
+        # 辞書は変更されずに差し替えられるため、参照を取得するだけでよい
+        sessions = self._sessions
+        if not sessions or (len(sessions) == 1 and exclude_session_id in sessions):
+            return  # 送信元以外のクライアントがいない場合はシリアライズも行わない
+        frame = _queued_frame(packet)  # シリアライズは1回だけ行い、全セッションで共有する
+        
+        await self._send_frame_to_clients(
+            (session for session_id, session in sessions.items() if session_id != exclude_session_id), frame)
     
     async def _send_to_group(self, group_id: int, packet: PacketFrame) -> None:
         """特定のグループに属するクライアントにパケットを送信"""
-        sessions_copy = []
-        async with self._sessions_lock:
-            sessions_copy = list(self._sessions.values())
-            
-        for session in sessions_copy:
-            if session.group_id == group_id:
-                await self._send_packet_to_client(session, packet)
+        # グループのインデックスから該当するセッションのみを取得（待機を挟まずに取得する）
+        session_ids = self._group_sessions.get(group_id)
+        if not session_ids:
+            return  # 該当するクライアントがいない場合はシリアライズも行わない
+        sessions = self._sessions
+        sessions_copy = [sessions[session_id] for session_id in session_ids if session_id in sessions]
+        frame = _queued_frame(packet)  # シリアライズは1回だけ行い、全セッションで共有する
+        
+        await self._send_frame_to_clients(sessions_copy, frame)
     
     async def _send_to_user(self, user_id: int, packet: PacketFrame) -> None:
         """特定のユーザーIDを持つすべてのクライアントにパケットを送信"""
         # ユーザーIDに関連付けられたすべてのセッションを取得
         session_ids = self._get_user_sessions(user_id)
+        if not session_ids:
+            return  # 該当するクライアントがいない場合はシリアライズも行わない
+        sessions = self._sessions
+        frame = _queued_frame(packet)  # シリアライズは1回だけ行い、全セッションで共有する
         
-        for session_id in session_ids:
-            session = None
-            async with self._sessions_lock:
-                session = self._sessions.get(session_id)
-            
-            if session and session.is_alive:
-                await self._send_packet_to_client(session, packet)
+        await self._send_frame_to_clients(
+            (sessions[session_id] for session_id in session_ids if session_id in sessions), frame)
     
     async def _send_to_user_and_group(self, user_id: int, group_id: int, packet: PacketFrame) -> None:
         """特定のユーザーIDとグループIDを持つクライアントにパケットを送信"""
-        # ユーザーIDに関連付けられたすべてのセッションを取得
-        session_ids = self._get_user_sessions(user_id)
+        # (ユーザーID, グループID) のインデックスから該当するセッションのみを取得（待機を挟まずに取得する）
+        session_ids = self._user_group_sessions.get((user_id, group_id))
+        if not session_ids:
+            return  # 該当するクライアントがいない場合はシリアライズも行わない
+        sessions = self._sessions
+        sessions_copy = [sessions[session_id] for session_id in session_ids if session_id in sessions]
+        frame = _queued_frame(packet)  # シリアライズは1回だけ行い、全セッションで共有する
         
-        for session_id in session_ids:
-            session = None
-            async with self._sessions_lock:
-                session = self._sessions.get(session_id)
+        await self._send_frame_to_clients(sessions_copy, frame)
             
-            if session and session.group_id == group_id and session.is_alive:
-                await self._send_packet_to_client(session, packet)
-            
-    async def _send_packet_to_client(self, session: TcpClientSession, packet: PacketFrame) -> None:
+    async def _send_frame_to_clients(self, sessions: Iterable[TcpClientSession],
+                                     frame: Tuple[bytes, bytes]) -> None:
         """
-        クライアントにパケットを送信する
+        複数のクライアントにシリアライズ済みのパケットを送信する
+        
+        すべてのセッションの送信キューに待機せずに積み、書き込みは各セッションの送信タスクが並行して行う。
+        キューが満杯のセッションがある場合のみ、それらの空きをまとめて並行に待つ
+        （送信が滞っているクライアントが他のクライアントへの配信を遅らせないようにする）。
+        SEND_BLOCK_TIMEOUT 秒以内に空きができないセッションは、受信を停止しているものとみなして切断する。
         
         Args:
-            session: 送信先クライアントセッション
-            packet: 送信するパケット
+            sessions: 送信先クライアントセッション
+            frame: _queued_frame() の戻り値（複数のセッションで共有する）
         """
-        if not session.is_alive:
-            debug_print(f"セッション {session.session_id} は既に切断されています")
-            return
+        blocked: List[TcpClientSession] = []
+        for session in sessions:
+            if not session.is_alive:
+                if packet_frame.DEBUG:
+                    debug_print(f"セッション {session.session_id} は既に切断されています")
+                continue
+            if not session.enqueue_frame(frame):
+                blocked.append(session)
+        
+        if blocked:
+            tasks = [asyncio.ensure_future(session.send_frame(frame)) for session in blocked]
+            try:
+                done, _ = await asyncio.wait(tasks, timeout=SEND_BLOCK_TIMEOUT)
+            finally:
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
             
-        writer = session.get_writer()
-        try:
-            await TcpProtocol.send_packet(writer, packet)
-            debug_print(f"パケット送信成功: セッションID {session.session_id}")
-        except Exception as e:
-            self.raise_log_message(f"パケット送信中にエラーが発生: {e}, セッションID: {session.session_id}")
-            # エラーが発生してもセッションは即座には閉じない
-            # 次のパケット受信時に切断が検出される
+            for session, task in zip(blocked, tasks):
+                if task not in done:
+                    self.raise_log_message(f"送信キューの空き待ちがタイムアウトしたため切断します: セッションID: {session.session_id}")
+                    session.abort()
+                elif task.exception() is not None:
+                    self.raise_log_message(f"パケット送信中にエラーが発生: {task.exception()}, セッションID: {session.session_id}")
+    
+    def _on_session_send_error(self, session: TcpClientSession, error: Exception) -> None:
+        """セッションの送信タスクで書き込みエラーが発生した"""
+        self.raise_log_message(f"パケット送信中にエラーが発生: {error}, セッションID: {session.session_id}")
             
     async def send_data_async(self, packet_data: PacketFrame) -> None:
         """
@@ -334,7 +732,9 @@ class TcpServer(ServerBase):
         Args:
             packet_data: 送信するパケット
         """
-        debug_print(f"send_data_async - 宛先ユーザーID: {packet_data.destination_user_id}, 宛先グループID: {packet_data.destination_group_id}")
+        # デバッグ無効時はメッセージの組み立て自体を行わない
+        if packet_frame.DEBUG:
+            debug_print(f"send_data_async - 宛先ユーザーID: {packet_data.destination_user_id}, 宛先グループID: {packet_data.destination_group_id}")
         
         # 宛先に応じた処理
         if packet_data.destination_user_id != 0 and packet_data.destination_user_id != 0xFFFF:
@@ -345,12 +745,10 @@ class TcpServer(ServerBase):
             await self._send_to_group(packet_data.destination_group_id, packet_data)
         else:
             # すべてのクライアントへの送信
-            sessions_copy = []
-            async with self._sessions_lock:
-                sessions_copy = list(self._sessions.values())
-                
-            for session in sessions_copy:
-                await self._send_packet_to_client(session, packet_data)
+            sessions = self._sessions
+            frame = _queued_frame(packet_data)  # シリアライズは1回だけ行い、全セッションで共有する
+            
+            await self._send_frame_to_clients(sessions.values(), frame)
                 
     def stop(self) -> None:
         """サーバーを停止する"""
@@ -360,13 +758,26 @@ class TcpServer(ServerBase):
         self._running = False
         
         # 全クライアントとの接続を閉じる
-        # ロックを使用せずにセッションリストのコピーを作成
-        sessions_copy = list(self._sessions.values())
+        # 辞書は変更されずに差し替えられるため、参照を取得するだけでよい
+        sessions = self._sessions
             
-        for session in sessions_copy:
+        for session in sessions.values():
             session.close()
             
+        # 受信パケットの処理タスクを停止
+        self._processor.close()
+            
         # サーバーを停止
         if self._server:
             self._server.close()
-
+    
+    async def stop_async(self) -> None:
+        """サーバーを停止し、すべてのクライアントとの接続が閉じられるまでまとめて待機する"""
+        sessions = self._sessions
+        server = self._server
+        self.stop()
+        
+        waiters = [session.get_writer().wait_closed() for session in sessions.values()]
+        if server is not None:
+            waiters.append(server.wait_closed())
+        await asyncio.gather(*waiters, return_exceptions=True)
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Socket import packet_frame  # noqa: E402
+from Socket.packet_frame import PacketFrame, PayloadType  # noqa: E402
+from Socket.tcp_protocol import PacketStreamReader, TcpProtocol  # noqa: E402
+from Socket.tcp_server import TcpServer  # noqa: E402
+
+packet_frame.DEBUG = False
+
+
+class TcpServerSendTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = TcpServer()
+        self.server_task = asyncio.create_task(self.server.start_async(0))
+        while self.server._server is None or not self.server._server.sockets:
+            await asyncio.sleep(0.01)
+        self.port = self.server._server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.stop()
+        self.server_task.cancel()
+        try:
+            await self.server_task
+        except asyncio.CancelledError:
+            pass
+
+    async def test_send_data_async_snapshots_reused_buffer(self):
+        """送信後に呼び出し元が bytearray を再利用しても、送信時点の内容が届く"""
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        await TcpProtocol.send_packet(writer, PacketFrame.from_handshake(5, 1))
+        packet_reader = PacketStreamReader(reader)
+        while not self.server._get_user_sessions(5):
+            await asyncio.sleep(0.01)
+
+        buffer = bytearray(b'A' * 1024)
+        await self.server.send_data_async(PacketFrame(0xFFFF, 5, payload_type=PayloadType.BinaryRaw, payload=buffer))
+        buffer[:] = b'B' * 1024
+        await self.server.send_data_async(PacketFrame(0xFFFF, 5, payload_type=PayloadType.BinaryRaw, payload=buffer))
+        buffer[:] = b'C' * 1024
+
+        received = []
+        while len(received) < 2:
+            packets = await asyncio.wait_for(packet_reader.read_packets(), 5)
+            self.assertIsNotNone(packets)
+            received.extend(bytes(p.payload) for p in packets if p.payload_type == PayloadType.BinaryRaw)
+
+        self.assertEqual(received, [b'A' * 1024, b'B' * 1024])
+        writer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()